@@ -0,0 +1,159 @@
+import sqlite3
+
+import pandas as pd
+
+ANOMALY_DB = "anomalies.sqlite"
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Flagged hours closer together than this belong to the same event
+EVENT_GAP = pd.Timedelta(hours=1)
+
+SCORE_COLUMNS = ['region', 'datetime', 'demand_MW', 'lof_anomaly', 'dbscan_anomaly',
+                 'isolation_forest_anomaly', 'ensemble_weighted_score', 'ensemble_final_anomaly']
+EVENT_COLUMNS = ['region', 'start', 'end', 'n_hours', 'peak_datetime', 'peak_score', 'peak_demand_MW']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    region TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    demand_MW REAL,
+    lof_anomaly INTEGER,
+    dbscan_anomaly INTEGER,
+    isolation_forest_anomaly INTEGER,
+    ensemble_weighted_score REAL,
+    ensemble_final_anomaly INTEGER,
+    PRIMARY KEY (region, datetime)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    region TEXT NOT NULL,
+    start TEXT NOT NULL,
+    "end" TEXT NOT NULL,
+    n_hours INTEGER,
+    peak_datetime TEXT,
+    peak_score REAL,
+    peak_demand_MW REAL,
+    PRIMARY KEY (region, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_by_end ON events (region, "end");
+CREATE INDEX IF NOT EXISTS events_by_peak ON events (region, peak_score);
+"""
+
+
+def connect(db_path: str = ANOMALY_DB) -> sqlite3.Connection:
+    """Open (and create if needed) the anomaly store."""
+    # Several region workers may append at once; wait for the write lock instead of failing
+    con = sqlite3.connect(db_path, timeout=60)
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _format(ts) -> str:
+    return pd.Timestamp(ts).strftime(DATETIME_FORMAT)
+
+
+def _events(region_df: pd.DataFrame) -> pd.DataFrame:
+    """Merge contiguous flagged hours of one region into events with start/end/peak."""
+    flagged = region_df[region_df['ensemble_final_anomaly'] == 1]
+    if flagged.empty:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    event_id = (flagged['datetime'].diff() > EVENT_GAP).cumsum()
+    groups = flagged.groupby(event_id)
+    # Peak = highest ensemble score, ties broken by the highest demand
+    ordered = flagged.sort_values(['ensemble_weighted_score', 'demand_MW'], ascending=False, kind='stable')
+    peaks = ordered.groupby(event_id.loc[ordered.index]).first()
+    return pd.DataFrame({
+        'region': flagged['region'].iloc[0],
+        'start': groups['datetime'].min(),
+        'end': groups['datetime'].max(),
+        'n_hours': groups.size(),
+        'peak_datetime': peaks['datetime'],
+        'peak_score': peaks['ensemble_weighted_score'],
+        'peak_demand_MW': peaks['demand_MW'],
+    }).reset_index(drop=True)[EVENT_COLUMNS]
+
+
+def append_scores(df: pd.DataFrame, db_path: str = ANOMALY_DB) -> int:
+    """
+    Append per-hour scores and flags to the store and update the events table.
+    Only hours newer than what is already stored for a region are written, so re-running
+    on an overlapping history never rewrites old rows. Returns the number of new rows.
+    """
+    con = connect(db_path)
+    written = 0
+    with con:
+        for region in pd.unique(df['region']):
+            region_df = df.loc[df['region'] == region, SCORE_COLUMNS].copy()
+            region_df['region'] = str(region)
+            region_df['datetime'] = pd.to_datetime(region_df['datetime'])
+            region_df = region_df.sort_values('datetime', kind='stable')
+
+            last = con.execute("SELECT MAX(datetime) FROM scores WHERE region = ?", (str(region),)).fetchone()[0]
+            if last is not None:
+                region_df = region_df[region_df['datetime'] > pd.Timestamp(last)]
+            if region_df.empty:
+                continue
+
+            rows = region_df.assign(datetime=region_df['datetime'].dt.strftime(DATETIME_FORMAT))
+            con.executemany(
+                f"INSERT OR IGNORE INTO scores ({', '.join(SCORE_COLUMNS)}) VALUES ({', '.join('?' * len(SCORE_COLUMNS))})",
+                rows.astype(object).itertuples(index=False, name=None))
+            written += len(rows)
+
+            events = _events(region_df)
+            if events.empty:
+                continue
+
+            # An event that continues the last stored one is merged into it
+            previous = con.execute(
+                'SELECT start, "end", n_hours, peak_datetime, peak_score, peak_demand_MW FROM events '
+                'WHERE region = ? ORDER BY start DESC LIMIT 1', (str(region),)).fetchone()
+            if previous is not None and events.loc[0, 'start'] - pd.Timestamp(previous[1]) <= EVENT_GAP:
+                first = events.loc[0]
+                events.loc[0, 'start'] = pd.Timestamp(previous[0])
+                events.loc[0, 'n_hours'] = first['n_hours'] + previous[2]
+                if (previous[4], previous[5]) >= (first['peak_score'], first['peak_demand_MW']):
+                    events.loc[0, ['peak_datetime', 'peak_score', 'peak_demand_MW']] = \
+                        [pd.Timestamp(previous[3]), previous[4], previous[5]]
+
+            for col in ['start', 'end', 'peak_datetime']:
+                events[col] = pd.to_datetime(events[col]).dt.strftime(DATETIME_FORMAT)
+            con.executemany(
+                'INSERT OR REPLACE INTO events (region, start, "end", n_hours, peak_datetime, peak_score, peak_demand_MW) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                events.astype(object).itertuples(index=False, name=None))
+    con.close()
+    print(f"[Store] Appended {written} scored hours to {db_path}")
+    return written
+
+
+def query_scores(region: str, start, end, flagged_only: bool = False, db_path: str = ANOMALY_DB) -> pd.DataFrame:
+    """Per-hour scores of one region with start <= datetime <= end."""
+    sql = "SELECT * FROM scores WHERE region = ? AND datetime BETWEEN ? AND ?"
+    if flagged_only:
+        sql += " AND ensemble_final_anomaly = 1"
+    con = connect(db_path)
+    result = pd.read_sql_query(sql + " ORDER BY datetime", con, params=(region, _format(start), _format(end)),
+                               parse_dates=['datetime'])
+    con.close()
+    return result
+
+
+def query_events(region: str, start, end, db_path: str = ANOMALY_DB) -> pd.DataFrame:
+    """Events of one region overlapping [start, end]."""
+    con = connect(db_path)
+    result = pd.read_sql_query(
+        'SELECT * FROM events WHERE region = ? AND "end" >= ? AND start <= ? ORDER BY start',
+        con, params=(region, _format(start), _format(end)), parse_dates=['start', 'end', 'peak_datetime'])
+    con.close()
+    return result
+
+
+def top_events(region: str, k: int = 10, db_path: str = ANOMALY_DB) -> pd.DataFrame:
+    """The k events of one region with the highest peak score (longest first on ties)."""
+    con = connect(db_path)
+    result = pd.read_sql_query(
+        'SELECT * FROM events WHERE region = ? ORDER BY peak_score DESC, n_hours DESC LIMIT ?',
+        con, params=(region, k), parse_dates=['start', 'end', 'peak_datetime'])
+    con.close()
+    return result
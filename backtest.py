@@ -0,0 +1,158 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config_models import (fit_detectors, predict_detectors, tune_dbscan_hyperparameters,
+                           add_ensemble_columns, model_cols)
+from model_frame import anomaly_features, region_slices, feature_matrix, read_compact_csv
+from drift import monthly_sketches, window_drift, drift_features
+
+BACKTEST_FILE = "backtest_results.csv"
+
+
+def walk_forward_windows(datetimes: pd.Series, train_months: int = 12, test_months: int = 1) -> list:
+    """
+    Split a time-ordered region into (train_rows, test_rows, test_start, test_end) windows:
+    train on the trailing `train_months`, score the next `test_months`, then roll forward.
+    """
+    datetimes = pd.DatetimeIndex(datetimes)
+    first = datetimes.min().to_period('M').to_timestamp()
+    last = datetimes.max()
+
+    windows = []
+    test_start = first + pd.DateOffset(months=train_months)
+    while test_start <= last:
+        test_end = test_start + pd.DateOffset(months=test_months)
+        train_start = test_start - pd.DateOffset(months=train_months)
+        train_rows = np.flatnonzero((datetimes >= train_start) & (datetimes < test_start))
+        test_rows = np.flatnonzero((datetimes >= test_start) & (datetimes < test_end))
+        if len(train_rows) and len(test_rows):
+            windows.append((train_rows, test_rows, test_start, test_end))
+        test_start = test_end
+    return windows
+
+
+def _run_window(region, train_X, test_X, features, n_trials, contamination, default_dbscan_params):
+    """Tune and fit on one training window, then score its test window (single-threaded: windows run in parallel)."""
+    import optuna
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+    start = time.perf_counter()
+    if n_trials > 0:
+        params = tune_dbscan_hyperparameters(train_X, region, features, n_trials=n_trials, n_jobs=1)
+    else:
+        params = default_dbscan_params
+    models = fit_detectors(train_X, features, eps=params['eps'], min_samples=params['min_samples'],
+                           contamination=contamination, n_jobs=1)
+    flags = predict_detectors(models, test_X, features)
+    return flags, params, time.perf_counter() - start
+
+
+def run_backtest(df: pd.DataFrame, features: list = None, train_months: int = 12, test_months: int = 1,
+                 n_trials: int = 20, contamination: float = 0.01, n_jobs: int = None,
+                 output_path: str = BACKTEST_FILE) -> pd.DataFrame:
+    """
+    Walk-forward backtest of all detectors and the weighted ensemble, with windows run in parallel.
+    If `df` holds batch results (the model_cols flags), each window's ensemble decisions are
+    compared with the batch decisions for the same hours.
+    """
+    features = features if features is not None else anomaly_features(df.columns)
+    X = feature_matrix(df, features)
+    has_batch = all(col in df.columns for col in model_cols)
+    if has_batch:
+        batch_final = add_ensemble_columns(df[model_cols].copy())['ensemble_final_anomaly'].to_numpy()
+
+    # Monthly sketches are merged into each window's train and test distributions
+    monitored = drift_features(features)
+    drift_X = feature_matrix(df, monitored)
+
+    tasks = []
+    sketches = {}
+    for region, rows in region_slices(df).items():
+        region_X = X[rows]
+        sketches[region] = monthly_sketches(drift_X[rows], df['datetime'].iloc[rows])
+        for train_rows, test_rows, test_start, test_end in walk_forward_windows(
+                df['datetime'].iloc[rows], train_months, test_months):
+            tasks.append((region, rows.start + test_rows, test_start, test_end, len(train_rows),
+                          region_X[train_rows], region_X[test_rows]))
+    print(f"[Backtest] {len(tasks)} windows ({train_months}-month train, {test_months}-month test).")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [
+            pool.submit(_run_window, region, train_X, test_X, features, n_trials, contamination,
+                        {'eps': 1.2, 'min_samples': 5})
+            for region, _, _, _, _, train_X, test_X in tasks
+        ]
+        for (region, test_positions, test_start, test_end, n_train, _, _), future in zip(tasks, futures):
+            flags, params, runtime = future.result()
+            flags = add_ensemble_columns(flags)
+            final = flags['ensemble_final_anomaly'].to_numpy()
+
+            row = {
+                'region': region,
+                'test_start': test_start,
+                'test_end': test_end,
+                'n_train': n_train,
+                'n_test': len(final),
+                'runtime_s': runtime,
+                'dbscan_eps': params['eps'],
+                'dbscan_min_samples': params['min_samples'],
+                **{col: int(flags[col].sum()) for col in model_cols},
+                'ensemble_final_anomaly': int(final.sum()),
+                'ensemble_rate': final.mean(),
+            }
+            drift = window_drift(sketches[region], monitored, test_start - pd.DateOffset(months=train_months),
+                                 test_start, test_start, test_end)
+            if not drift.empty:
+                row['max_psi'] = drift['psi'].max()
+                row['drifted_features'] = int(drift['drifted'].sum())
+                row['top_drift_feature'] = drift.sort_values('psi', ascending=False)['feature'].iloc[0]
+            if has_batch:
+                batch = batch_final[test_positions]
+                both = int((final & batch).sum())
+                either = int((final | batch).sum())
+                row['batch_ensemble_anomaly'] = int(batch.sum())
+                row['agreement_with_batch'] = (final == batch).mean()
+                row['jaccard_with_batch'] = both / either if either else 1.0
+            results.append(row)
+            print(f"  [Backtest] {region} {test_start:%Y-%m}: {row['ensemble_final_anomaly']} anomalies "
+                  f"in {row['n_test']} rows ({runtime:.1f}s)")
+
+    results = pd.DataFrame(results)
+    results.to_csv(output_path, index=False)
+    if results.empty:
+        print("\n[Backtest] No window has both training and test rows; nothing to summarize.")
+        return results
+
+    print("\n--- Backtest summary by region ---")
+    # Drift columns exist only when some window had drift scores (and batch columns only with batch flags)
+    summary_cols = [col for col in ['runtime_s', 'ensemble_rate', 'max_psi', 'drifted_features'] + model_cols
+                    + ['agreement_with_batch', 'jaccard_with_batch'] if col in results.columns]
+    print(results.groupby('region', sort=False)[summary_cols].agg(['mean', 'std']).T)
+    # Window-to-window stability of the ensemble: spread of the monthly anomaly rate
+    print(results.groupby('region', sort=False)['ensemble_rate'].agg(['mean', 'std', 'min', 'max']))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the anomaly detectors.")
+    parser.add_argument("--train-months", type=int, default=12)
+    parser.add_argument("--test-months", type=int, default=1)
+    parser.add_argument("--trials", type=int, default=20, help="DBSCAN tuning trials per window (0 = defaults).")
+    parser.add_argument("--jobs", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args()
+
+    if os.path.exists("final_with_anomalies.csv"):
+        df = read_compact_csv("final_with_anomalies.csv")
+    else:
+        from s3_save_data import get_base_df
+        df = get_base_df()
+
+    run_backtest(df, train_months=args.train_months, test_months=args.test_months,
+                 n_trials=args.trials, n_jobs=args.jobs)
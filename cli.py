@@ -0,0 +1,137 @@
+import argparse
+import sys
+
+# Only argparse is imported at startup: every stage module (pandas, sklearn, optuna, shap, seaborn)
+# is imported inside the subcommand that needs it, so --help and argument errors return at once.
+
+DETECTORS = {
+    'lof': 'lof_anomaly',
+    'dbscan': 'dbscan_anomaly',
+    'iforest': 'isolation_forest_anomaly',
+}
+
+
+def _names(value: str) -> list:
+    """Comma-separated names, e.g. 'ERCOT,CAISO'."""
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _detectors(value: str) -> list:
+    columns = []
+    for name in _names(value):
+        if name not in DETECTORS and name not in DETECTORS.values():
+            raise argparse.ArgumentTypeError(f"unknown detector '{name}' (choose from {', '.join(DETECTORS)})")
+        columns.append(DETECTORS.get(name, name))
+    return columns
+
+
+def _ingest(args):
+    from settings import load_region_catalog
+    from s3_save_data import ingest_regions
+
+    catalog = load_region_catalog(args.catalog)
+    if args.regions:
+        unknown = sorted(set(args.regions) - set(catalog))
+        if unknown:
+            print(f"[CLI] Regions not in the catalog: {unknown}")
+        catalog = {name: info for name, info in catalog.items() if name in args.regions}
+    ingest_regions(catalog)
+
+
+def _features(args):
+    from s3_save_data import build_features
+
+    build_features(regions=args.regions, memory_limit_mb=args.memory_mb)
+
+
+def _detect(args):
+    from s5_run_models import run_models
+
+    run_models(regions=args.regions, detectors=args.detectors)
+
+
+def _eval(args):
+    from s6_eval import run_eval
+
+    run_eval(regions=args.regions, detectors=args.detectors)
+
+
+def _shap(args):
+    from config_models import add_ensemble_columns
+    from model_frame import select_regions
+    from report import Report
+    from s6_eval import get_anomaly_df, compute_shap
+    from s7_shap_analysis import run_shap
+    from s8_examine import deep_analyze_anomalies
+
+    report = Report(args.output_dir)
+    df = add_ensemble_columns(select_regions(get_anomaly_df(), args.regions))
+    shap_results = compute_shap(df)
+    run_shap(report, df, shap_results, detectors=args.detectors)
+    deep_analyze_anomalies(report, df, shap_results)
+    report.render(n_jobs=args.jobs)
+
+
+def _plots(args):
+    from model_frame import select_regions
+    from report import Report
+    from s3_save_data import get_base_df
+    from s4_eda import eda
+
+    report = Report(args.output_dir)
+    eda(report, select_regions(get_base_df(), args.regions))
+    report.render(n_jobs=args.jobs)
+
+
+def _preview(args):
+    from preview import run_preview
+
+    run_preview(fraction=args.fraction, regions=args.regions, n_trials=args.trials, shap=not args.no_shap)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Run the energy anomaly pipeline stage by stage.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    regions = argparse.ArgumentParser(add_help=False)
+    regions.add_argument("--regions", type=_names, default=None,
+                         help="Comma-separated region names (default: all). Saved outputs keep the other regions.")
+    detectors = argparse.ArgumentParser(add_help=False)
+    detectors.add_argument("--detectors", type=_detectors, default=None,
+                           help=f"Comma-separated detectors out of {', '.join(DETECTORS)} (default: all).")
+    figures = argparse.ArgumentParser(add_help=False)
+    figures.add_argument("--output-dir", default="report", help="Folder for the figures and index.html.")
+    figures.add_argument("--jobs", type=int, default=None, help="Number of rendering processes.")
+
+    ingest = subparsers.add_parser("ingest", parents=[regions], help="Download demand and weather per region.")
+    ingest.add_argument("--catalog", default=None, help="Region catalog file (CSV or JSON).")
+    ingest.set_defaults(func=_ingest)
+
+    features = subparsers.add_parser("features", parents=[regions], help="Build model features from the downloaded data.")
+    features.add_argument("--memory-mb", type=float, default=None,
+                          help="Stream each region in chunks within this memory limit (for long histories).")
+    features.set_defaults(func=_features)
+    subparsers.add_parser("detect", parents=[regions, detectors],
+                          help="Run the anomaly detectors; detectors left out keep their saved flags.").set_defaults(func=_detect)
+    subparsers.add_parser("eval", parents=[regions, detectors],
+                          help="Anomaly counts, ensemble and anomaly store update.").set_defaults(func=_eval)
+    subparsers.add_parser("shap", parents=[regions, detectors, figures],
+                          help="SHAP explanations of the Isolation Forest anomalies.").set_defaults(func=_shap)
+    subparsers.add_parser("plots", parents=[regions, figures],
+                          help="Exploratory data analysis figures.").set_defaults(func=_plots)
+    preview = subparsers.add_parser("preview", parents=[regions],
+                                    help="Run detect, ensemble and SHAP on a stratified sample and compare with the last full run.")
+    preview.add_argument("--fraction", type=float, default=0.1, help="Share of rows kept per hour/season/weekend stratum.")
+    preview.add_argument("--trials", type=int, default=10, help="DBSCAN tuning trials per region.")
+    preview.add_argument("--no-shap", action="store_true", help="Skip the SHAP comparison.")
+    preview.set_defaults(func=_preview)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,96 @@
+import numpy as np
 import pandas as pd
-from sklearn.neighbors import LocalOutlierFactor
+from sklearn.neighbors import LocalOutlierFactor, NearestNeighbors
 from sklearn.preprocessing import StandardScaler
-import optuna
 from sklearn.cluster import DBSCAN
 from sklearn.metrics import silhouette_score
+from settings import CONFIG
+from grid_dbscan import grid_dbscan
 
-def run_lof(df: pd.DataFrame, features: list, contamination=0.01) -> pd.Series:
-    scaler = StandardScaler()
-    scaled_features = scaler.fit_transform(df[features])
+model_cols = ['lof_anomaly', 'dbscan_anomaly', 'isolation_forest_anomaly']
+
+# We trust LOF and Isolation Forest more, so we weight them higher
+weights = {
+    'lof_anomaly': 0.4,
+    'dbscan_anomaly': 0.2,
+    'isolation_forest_anomaly': 0.4
+}
+
+# Define threshold to decide which is the final anomaly
+# We consider a point an anomaly if at least ONE of the reliable models
+# (LOF or Isolation Forest) flags it. Since their weight is 0.4, any score >= 0.4 indicates at least one flagged it.
+anomaly_threshold = 0.4
+
+# With CONFIG["dbscan_mode"] = "auto", regions with at least this many rows use the partitioned DBSCAN
+DBSCAN_GRID_MIN_ROWS = 200_000
+
+
+def add_ensemble_columns(df):
+    """Add the simple and weighted ensemble scores and the final anomaly flag."""
+    df['ensemble_score_simple'] = df[model_cols].sum(axis=1)
+    df['ensemble_weighted_score'] = (
+        df['lof_anomaly'] * weights['lof_anomaly'] +
+        df['dbscan_anomaly'] * weights['dbscan_anomaly'] +
+        df['isolation_forest_anomaly'] * weights['isolation_forest_anomaly']
+    )
+    df['ensemble_final_anomaly'] = (df['ensemble_weighted_score'] >= anomaly_threshold).astype(int)
+    return df
+
+
+def _feature_matrix(df, features: list) -> np.ndarray:
+    """Features as a NumPy matrix. A matrix that is passed in (e.g. a region view) is used as is."""
+    if isinstance(df, np.ndarray):
+        return df
+    return df[features].to_numpy()
+
+def _to_flags(predictions, df) -> pd.Series:
+    """Convert -1 (outlier/noise) to 1, and everything else to 0."""
+    index = df.index if isinstance(df, pd.DataFrame) else None
+    return pd.Series((predictions == -1).astype('int8'), index=index)
+
+def _scaled_matrix(df, features: list, scaled: bool) -> np.ndarray:
+    """Standardized features. With scaled=True the input is already standardized (e.g. a feature store map)."""
+    if scaled:
+        return _feature_matrix(df, features)
+    return StandardScaler().fit_transform(_feature_matrix(df, features))
+
+def dbscan_labels(data: np.ndarray, eps: float, min_samples: int, algorithm: str = None, n_jobs: int = None):
+    """
+    DBSCAN cluster labels (-1 = noise) and core sample mask of a scaled matrix.
+    `algorithm` is "sklearn", "grid" (partitioned, bounded memory, see grid_dbscan) or "auto"
+    (grid for large inputs); default: CONFIG["dbscan_mode"]. Both give the same noise points.
+    `n_jobs`: -1 = every core, None = the implementation's default (scikit-learn: 1, grid: every core);
+    pass 1 when the caller already runs in a worker pool.
+    """
+    algorithm = algorithm or CONFIG["dbscan_mode"]
+    if algorithm == "auto":
+        algorithm = "grid" if len(data) >= DBSCAN_GRID_MIN_ROWS else "sklearn"
+    if algorithm == "grid":
+        return grid_dbscan(data, eps, min_samples, n_jobs=n_jobs)
+    if algorithm != "sklearn":
+        raise ValueError(f"Unknown DBSCAN algorithm '{algorithm}' (choose sklearn, grid or auto)")
+    model = DBSCAN(eps=eps, min_samples=min_samples, n_jobs=n_jobs).fit(data)
+    core = np.zeros(len(data), dtype=bool)
+    core[model.core_sample_indices_] = True
+    return model.labels_, core
+
+def run_lof(df: pd.DataFrame, features: list, contamination=0.01, scaled=False) -> pd.Series:
+    scaled_features = _scaled_matrix(df, features, scaled)
 
     model = LocalOutlierFactor(n_neighbors=20, contamination=contamination, novelty=False)
     predictions = model.fit_predict(scaled_features)
-    # Convert -1 (outlier) to 1, and 1 (inlier) to 0
-    return pd.Series(predictions, index=df.index).apply(lambda x: 1 if x == -1 else 0)
+    return _to_flags(predictions, df)
 
-def tune_dbscan_hyperparameters(df: pd.DataFrame, region_name: str, features: list, n_trials: int = 50) -> dict:
+def tune_dbscan_hyperparameters(df: pd.DataFrame, region_name: str, features: list, n_trials: int = 50, scaled=False,
+                                n_jobs: int = -1) -> dict:
     """
     Use Optuna to find the best hyperparameters for DBSCAN on a specific region.
+    `n_jobs` is passed to every trial's DBSCAN; use 1 when tuning runs inside a worker process.
     """
     print(f"\n--- Start hyperparameter tuning for DBSCAN in region {region_name} ---")
 
     # 1. Normalize features
-    scaler = StandardScaler()
-    data_scaled = scaler.fit_transform(df[features])
+    data_scaled = _scaled_matrix(df, features, scaled)
 
     # 2. Define the objective function for Optuna
     # Silhouette Score measure how well clusters are separated. Higher is better.
@@ -31,8 +99,7 @@ def tune_dbscan_hyperparameters(df: pd.DataFrame, region_name: str, features: li
         min_samples = trial.suggest_int('min_samples', 5, 150)
 
         # Run DBSCAN with suggested parameters
-        model = DBSCAN(eps=eps, min_samples=min_samples, n_jobs=8)
-        labels = model.fit_predict(data_scaled)
+        labels, _ = dbscan_labels(data_scaled, eps, min_samples, n_jobs=n_jobs)
 
         # Handle case where DBSCAN finds no clusters (all noise or single cluster)
         # Silhouette Score requires at least 2 clusters to compute.
@@ -43,8 +110,9 @@ def tune_dbscan_hyperparameters(df: pd.DataFrame, region_name: str, features: li
         score = silhouette_score(data_scaled, labels, sample_size=10000, random_state=42)
         return score
 
-    # 3. Run Optuna study
+    # 3. Run Optuna study (imported here: only tuning needs it)
     # 'direction="maximize"' since we want silhouette score to be as high as possible
+    import optuna
     study = optuna.create_study(direction="maximize")
     study.optimize(objective, n_trials=n_trials)
 
@@ -54,21 +122,59 @@ def tune_dbscan_hyperparameters(df: pd.DataFrame, region_name: str, features: li
 
     return study.best_params
 
-def run_dbscan(df: pd.DataFrame, features: list, eps=1.2, min_samples=5) -> pd.Series:
+def run_dbscan(df: pd.DataFrame, features: list, eps=1.2, min_samples=5, scaled=False, algorithm=None,
+               n_jobs: int = None) -> pd.Series:
     """
     NOTICE: DBSCAN is very sensitive to hyperparameters (eps, min_samples).
+    `algorithm` selects the implementation and `n_jobs` its parallelism (see dbscan_labels); the flags are the same.
     """
-    scaler = StandardScaler()
-    scaled_features = scaler.fit_transform(df[features])
+    scaled_features = _scaled_matrix(df, features, scaled)
 
-    model = DBSCAN(eps=eps, min_samples=min_samples)
-    predictions = model.fit_predict(scaled_features)
+    predictions, _ = dbscan_labels(scaled_features, eps, min_samples, algorithm=algorithm, n_jobs=n_jobs)
     # Convert -1 (noise/outlier) to 1, and others to 0
-    return pd.Series(predictions, index=df.index).apply(lambda x: 1 if x == -1 else 0)
+    return _to_flags(predictions, df)
 
 from sklearn.ensemble import IsolationForest
 
 def run_isolation_forest(df: pd.DataFrame, features: list, contamination=0.01) -> pd.Series:
     model = IsolationForest(n_estimators=200, contamination=contamination, random_state=42)
-    predictions = model.fit_predict(df[features])
-    return pd.Series(predictions, index=df.index).apply(lambda x: 1 if x == -1 else 0)
\ No newline at end of file
+    predictions = model.fit_predict(_feature_matrix(df, features))
+    return _to_flags(predictions, df)
+
+def fit_detectors(train, features: list, eps=1.2, min_samples=5, contamination=0.01, n_jobs: int = None) -> dict:
+    """
+    Fit all three detectors on past data only, so they can score rows they have not seen.
+    The scaler is fitted on the training rows as well. `n_jobs` is DBSCAN's parallelism (see dbscan_labels).
+    """
+    scaler = StandardScaler()
+    train_scaled = scaler.fit_transform(_feature_matrix(train, features))
+
+    lof = LocalOutlierFactor(n_neighbors=20, contamination=contamination, novelty=True)
+    lof.fit(train_scaled)
+
+    _, core_mask = dbscan_labels(train_scaled, eps, min_samples, n_jobs=n_jobs)
+    # A new point is DBSCAN noise if no core sample of the training clusters lies within eps
+    core = NearestNeighbors(n_neighbors=1).fit(train_scaled[core_mask]) if core_mask.any() else None
+
+    isolation_forest = IsolationForest(n_estimators=200, contamination=contamination, random_state=42)
+    isolation_forest.fit(train_scaled)
+
+    return {"scaler": scaler, "lof": lof, "dbscan_core": core, "eps": eps, "isolation_forest": isolation_forest}
+
+
+def predict_detectors(models: dict, df, features: list) -> pd.DataFrame:
+    """Score rows with detectors from fit_detectors; returns one 0/1 column per entry of model_cols."""
+    scaled = models["scaler"].transform(_feature_matrix(df, features))
+
+    if models["dbscan_core"] is None:
+        dbscan_noise = np.ones(len(scaled), dtype=bool)
+    else:
+        distances, _ = models["dbscan_core"].kneighbors(scaled)
+        dbscan_noise = distances[:, 0] > models["eps"]
+
+    index = df.index if isinstance(df, pd.DataFrame) else None
+    return pd.DataFrame({
+        'lof_anomaly': (models["lof"].predict(scaled) == -1).astype('int8'),
+        'dbscan_anomaly': dbscan_noise.astype('int8'),
+        'isolation_forest_anomaly': (models["isolation_forest"].predict(scaled) == -1).astype('int8'),
+    }, index=index)
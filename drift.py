@@ -0,0 +1,276 @@
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from model_frame import anomaly_features, region_slices, feature_matrix
+
+DRIFT_FILE = "drift_report.csv"
+
+# Log-bucket quantile sketch (DDSketch): every bucket spans values within RELATIVE_ACCURACY of each
+# other, so quantiles have a bounded relative error. |x| below MIN_VALUE counts as 0 and |x| above
+# MAX_VALUE goes to the top bucket, which keeps the sketch a fixed-size count array.
+RELATIVE_ACCURACY = 0.01
+MIN_VALUE = 1e-4
+MAX_VALUE = 1e8
+_LOG_GAMMA = np.log((1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY))
+_MIN_KEY = int(np.ceil(np.log(MIN_VALUE) / _LOG_GAMMA))
+_MAX_KEY = int(np.ceil(np.log(MAX_VALUE) / _LOG_GAMMA))
+_N_KEYS = _MAX_KEY - _MIN_KEY + 1
+
+# A feature is reported as drifted above either threshold (PSI 0.2 = "significant shift" rule of thumb)
+PSI_ALERT = 0.2
+KS_ALERT = 0.1
+PSI_BINS = 10
+
+# Calendar encodings follow the clock, so any month differs from a longer baseline by construction
+CALENDAR_FEATURES = ['hour_sin', 'hour_cos', 'day_of_year_sin', 'day_of_year_cos', 'is_weekend', 'is_holiday']
+
+# Smoothed columns (rolling windows, EWMA) move slowly, so one month holds only a few independent values
+# of them and sampling noise alone crosses the thresholds; their raw inputs and lags are monitored instead
+SMOOTHED_MARKERS = ('_rolling_', '_ewma_')
+
+
+def drift_features(columns) -> list:
+    """Detector inputs whose distribution can actually drift: the anomaly features minus the calendar and smoothed ones."""
+    return [f for f in anomaly_features(columns)
+            if f not in CALENDAR_FEATURES and not any(marker in f for marker in SMOOTHED_MARKERS)]
+
+
+class FeatureSketch:
+    """
+    Quantile sketch and moments of several features over one time window.
+    Adding rows costs O(1) per value, and two sketches merge exactly by adding their counts,
+    so monthly sketches can be combined into any longer window.
+
+    Buckets are ordered by value: negative keys from the largest |x| down, then zero, then positive keys.
+    """
+
+    def __init__(self, n_features: int):
+        self.counts = np.zeros((n_features, 2 * _N_KEYS + 1), dtype=np.int32)
+        self.count = np.zeros(n_features, dtype=np.int64)
+        self.missing = np.zeros(n_features, dtype=np.int64)
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+
+    @staticmethod
+    def _bucket(X: np.ndarray) -> np.ndarray:
+        """Ordered bucket position of each value."""
+        magnitude = np.abs(X)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            keys = np.ceil(np.log(np.maximum(magnitude, MIN_VALUE)) / _LOG_GAMMA)
+        keys = np.clip(keys, _MIN_KEY, _MAX_KEY).astype(np.int64) - _MIN_KEY
+        return np.where(magnitude < MIN_VALUE, _N_KEYS, np.where(X > 0, _N_KEYS + 1 + keys, _N_KEYS - 1 - keys))
+
+    def update(self, X: np.ndarray) -> "FeatureSketch":
+        """Add rows of X (rows x features); NaN values are counted as missing."""
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return self
+        observed = ~np.isnan(X)
+        n_features, width = self.counts.shape
+        cells = self._bucket(np.where(observed, X, 0.0)) + np.arange(n_features) * width
+        self.counts += np.bincount(cells[observed], minlength=n_features * width).reshape(n_features, width)
+
+        # Batch moments, combined with the running ones as in merge
+        other = FeatureSketch(n_features)
+        other.count = observed.sum(axis=0)
+        other.missing = len(X) - other.count
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            other.mean = np.where(other.count > 0, np.nanmean(X, axis=0), 0.0)
+            other.m2 = np.where(other.count > 0, np.nansum((X - other.mean) ** 2, axis=0), 0.0)
+        other.min = np.where(other.count > 0, np.nanmin(np.where(observed, X, np.inf), axis=0), np.inf)
+        other.max = np.where(other.count > 0, np.nanmax(np.where(observed, X, -np.inf), axis=0), -np.inf)
+        self._merge_moments(other)
+        return self
+
+    def _merge_moments(self, other: "FeatureSketch"):
+        total = self.count + other.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = other.mean - self.mean
+            weight = np.where(total > 0, other.count / np.maximum(total, 1), 0.0)
+            self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * weight
+            self.mean = self.mean + delta * weight
+        self.count = total
+        self.missing = self.missing + other.missing
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    def merge(self, other: "FeatureSketch") -> "FeatureSketch":
+        """Add another window's sketch into this one (in place)."""
+        self.counts += other.counts
+        self._merge_moments(other)
+        return self
+
+    @property
+    def std(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    def cdf(self) -> np.ndarray:
+        """Fraction of each feature's values at or below every bucket (features x buckets)."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.cumsum(self.counts, axis=1, dtype=np.int64) / self.count[:, None]
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Approximate q-quantile of every feature (relative error <= RELATIVE_ACCURACY inside the key range)."""
+        cumulative = np.cumsum(self.counts, axis=1, dtype=np.int64)
+        position = np.argmax(cumulative > q * (self.count[:, None] - 1), axis=1)
+        key = np.abs(position - _N_KEYS) - 1 + _MIN_KEY
+        value = 2 * np.exp(key * _LOG_GAMMA) / (1 + np.exp(_LOG_GAMMA))
+        value = np.select([position < _N_KEYS, position == _N_KEYS], [-value, 0.0], value)
+        return np.where(self.count > 0, np.clip(value, self.min, self.max), np.nan)
+
+
+def merge_sketches(sketches) -> FeatureSketch:
+    """One sketch of the union of the windows."""
+    sketches = list(sketches)
+    merged = FeatureSketch(len(sketches[0].count))
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+def drift_scores(baseline: FeatureSketch, current: FeatureSketch, features: list) -> pd.DataFrame:
+    """
+    Per-feature drift of `current` against `baseline`:
+    PSI over the baseline deciles, KS distance between the two bucketed CDFs,
+    mean shift in baseline standard deviations and the ratio of standard deviations.
+    """
+    base_cdf, current_cdf = baseline.cdf(), current.cdf()
+    ks = np.nanmax(np.abs(base_cdf - current_cdf), axis=1, initial=0.0)
+
+    psi = np.full(len(features), np.nan)
+    for i in range(len(features)):
+        if baseline.count[i] == 0 or current.count[i] == 0:
+            continue
+        # Bin edges at the buckets holding the baseline deciles (fewer bins when values repeat)
+        edges = np.unique(np.searchsorted(base_cdf[i], np.arange(1, PSI_BINS) / PSI_BINS))
+        edges = edges[edges < base_cdf.shape[1] - 1]
+        expected = np.diff(np.r_[0.0, base_cdf[i, edges], 1.0])
+        actual = np.diff(np.r_[0.0, current_cdf[i, edges], 1.0])
+        expected, actual = np.maximum(expected, 1e-4), np.maximum(actual, 1e-4)
+        psi[i] = np.sum((actual - expected) * np.log(actual / expected))
+
+    base_std = baseline.std
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_shift = np.where(base_std > 0, (current.mean - baseline.mean) / base_std, 0.0)
+        std_ratio = np.where(base_std > 0, current.std / base_std, np.nan)
+    scores = pd.DataFrame({
+        'feature': features,
+        'n_baseline': baseline.count,
+        'n_current': current.count,
+        'psi': psi,
+        'ks': ks,
+        'mean_shift': mean_shift,
+        'std_ratio': std_ratio,
+        'baseline_median': baseline.quantile(0.5),
+        'current_median': current.quantile(0.5),
+    })
+    scores['drifted'] = (scores['psi'] >= PSI_ALERT) | (scores['ks'] >= KS_ALERT)
+    return scores
+
+
+def monthly_sketches(X: np.ndarray, datetimes: pd.Series) -> dict:
+    """{month start: FeatureSketch} of one region's raw feature rows."""
+    months = pd.DatetimeIndex(datetimes).to_period('M').to_timestamp().to_numpy()
+    order = np.argsort(months, kind='stable')
+    starts = np.flatnonzero(np.r_[True, months[order][1:] != months[order][:-1]])
+    stops = np.r_[starts[1:], len(order)]
+    return {pd.Timestamp(months[order[start]]): FeatureSketch(X.shape[1]).update(X[order[start:stop]])
+            for start, stop in zip(starts, stops)}
+
+
+def window_drift(region_sketches: dict, features: list, baseline_start, baseline_end, current_start, current_end) -> pd.DataFrame:
+    """Drift of the months in [current_start, current_end) against the months in [baseline_start, baseline_end)."""
+    baseline = [s for month, s in region_sketches.items() if baseline_start <= month < baseline_end]
+    current = [s for month, s in region_sketches.items() if current_start <= month < current_end]
+    if not baseline or not current:
+        return pd.DataFrame()
+    return drift_scores(merge_sketches(baseline), merge_sketches(current), features)
+
+
+def baseline_months(months: list, month, baseline: str = "training", trailing_months: int = 12, baseline_end=None) -> list:
+    """
+    Months a scored month is compared with, never including the month itself:
+    "training" = the training window the detectors were fitted on, every month before `baseline_end`
+    (default: the whole history); "same_month" = the same calendar month of earlier years;
+    "trailing" = the `trailing_months` months before it.
+    """
+    if baseline == "training":
+        end = pd.Timestamp(baseline_end) if baseline_end is not None else months[-1] + pd.DateOffset(months=1)
+        return [m for m in months if m < end and m != month]
+    if baseline == "same_month":
+        return [m for m in months if m < month and m.month == month.month]
+    if baseline == "trailing":
+        return [m for m in months if month - pd.DateOffset(months=trailing_months) <= m < month]
+    raise ValueError(f"Unknown drift baseline '{baseline}' (choose from training, same_month, trailing)")
+
+
+def run_drift_monitor(df: pd.DataFrame, features: list = None, baseline: str = "training", trailing_months: int = 12,
+                      baseline_end=None, output_path: str = DRIFT_FILE) -> pd.DataFrame:
+    """
+    Score every month of every region against a baseline of other months (see baseline_months):
+    by default the training window (all months before `baseline_end`, whole history if None) without
+    the scored month; months without a baseline are not scored.
+    Calendar and smoothed features are left out. Saves one row per region, month and feature.
+    """
+    start = time.perf_counter()
+    features = drift_features(features if features is not None else df.columns)
+    X = feature_matrix(df, features)
+
+    results = []
+    for region, rows in region_slices(df).items():
+        region_sketches = monthly_sketches(X[rows], df['datetime'].iloc[rows])
+        months = sorted(region_sketches)
+        skipped = 0
+        for month in months:
+            reference = baseline_months(months, month, baseline, trailing_months, baseline_end)
+            if not reference:
+                skipped += 1
+                continue
+            scores = drift_scores(merge_sketches(region_sketches[m] for m in reference), region_sketches[month], features)
+            scores.insert(0, 'month', month)
+            scores.insert(0, 'region', region)
+            results.append(scores)
+        if skipped:
+            print(f"  [Drift] {region}: {skipped} of {len(months)} months have no baseline yet and are not scored.")
+    results = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+    if output_path and not results.empty:
+        results.to_csv(output_path, index=False)
+
+    label = {"training": "the training window" + (f" (before {pd.Timestamp(baseline_end):%Y-%m-%d})"
+                                                  if baseline_end is not None else ""),
+             "same_month": "the same month of earlier years",
+             "trailing": f"the previous {trailing_months} months"}[baseline]
+    print(f"\n--- Feature drift against {label} ({time.perf_counter() - start:.2f}s) ---")
+    if results.empty:
+        return results
+    for region, scores in results.groupby('region', sort=False):
+        drifted = scores[scores['drifted']]
+        latest = scores[scores['month'] == scores['month'].max()].sort_values('psi', ascending=False)
+        print(f"  [Drift] {region}: {drifted['month'].nunique()} of {scores['month'].nunique()} months "
+              f"with drifted features; latest month top PSI: "
+              + ", ".join(f"{row.feature} {row.psi:.2f}" for row in latest.head(3).itertuples()))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from model_frame import read_compact_csv
+
+    parser = argparse.ArgumentParser(description="Monthly feature drift against a baseline of other months.")
+    parser.add_argument("--input", default="final_with_anomalies.csv")
+    parser.add_argument("--baseline", choices=["training", "same_month", "trailing"], default="training")
+    parser.add_argument("--trailing-months", type=int, default=12)
+    parser.add_argument("--baseline-end", default=None,
+                        help="End of the training window used by --baseline training (default: the whole history).")
+    args = parser.parse_args()
+
+    run_drift_monitor(read_compact_csv(args.input), baseline=args.baseline, trailing_months=args.trailing_months,
+                      baseline_end=args.baseline_end)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import ttest_ind_from_stats
+
+STATS_COLUMNS = ['region', 'hour', 'rank', 'datetime', 'statistic', 'value']
+
+
+def _tidy(values: pd.DataFrame, index_cols: list) -> pd.DataFrame:
+    """Melt a wide per-group table into (index..., statistic, value) rows."""
+    return values.reset_index().melt(id_vars=index_cols, var_name='statistic', value_name='value')
+
+
+def compute_eda_stats(df: pd.DataFrame, target: str = 'demand_MW', top_k: int = 5) -> pd.DataFrame:
+    """
+    Compute every EDA statistic per region and per (region, hour) in grouped, vectorized passes.
+    Returns a tidy table with the columns in STATS_COLUMNS.
+    """
+    data = df[['region', 'hour', 'temp_celsius', 'is_weekend', 'datetime', target, f'{target}_lag_24h']].copy()
+    data['region'] = data['region'].astype('category')
+    x = data[target]
+    by_region = data.groupby('region', observed=True, sort=False)
+    by_hour = data.groupby(['region', 'hour'], observed=True, sort=True)
+
+    # 1. Moments (population skewness and excess kurtosis, as in scipy.stats)
+    centered = x - by_region[target].transform('mean')
+    moments = pd.DataFrame({
+        'region': data['region'],
+        'count': x.notna().astype(int),
+        'mean': x,
+        'm2': centered ** 2,
+        'm3': centered ** 3,
+        'm4': centered ** 4,
+    }).groupby('region', observed=True, sort=False).agg(
+        {'count': 'sum', 'mean': 'mean', 'm2': 'mean', 'm3': 'mean', 'm4': 'mean'})
+    region_stats = pd.DataFrame({
+        'count': moments['count'],
+        'mean': moments['mean'],
+        'skewness': moments['m3'] / moments['m2'] ** 1.5,
+        'kurtosis': moments['m4'] / moments['m2'] ** 2 - 3.0,
+    })
+
+    # 2. IQR outliers per region and per (region, hour)
+    def iqr_outliers(groups, keys):
+        q = groups[target].quantile([0.25, 0.75]).unstack()
+        iqr = q[0.75] - q[0.25]
+        bounds = pd.DataFrame({'q1': q[0.25], 'q3': q[0.75],
+                               'lower_bound': q[0.25] - 1.5 * iqr, 'upper_bound': q[0.75] + 1.5 * iqr})
+        row_keys = pd.MultiIndex.from_arrays([data[k] for k in keys]) if len(keys) > 1 else data[keys[0]]
+        lower = bounds['lower_bound'].reindex(row_keys).to_numpy()
+        upper = bounds['upper_bound'].reindex(row_keys).to_numpy()
+        is_outlier = pd.Series((x.to_numpy() < lower) | (x.to_numpy() > upper), index=data.index)
+        bounds['outliers'] = is_outlier.groupby([data[k] for k in keys], observed=True).sum()
+        return bounds
+
+    region_iqr = iqr_outliers(by_region, ['region'])
+    region_stats = region_stats.join(region_iqr)
+    region_stats['outlier_pct'] = region_stats['outliers'] / region_stats['count'] * 100
+
+    hour_stats = iqr_outliers(by_hour, ['region', 'hour'])
+    hour_stats['mean'] = by_hour[target].mean()
+
+    # 3. Demand at extreme temperatures (5th/95th temperature percentiles per region)
+    temp_q = by_region['temp_celsius'].quantile([0.05, 0.95]).unstack()
+    low = temp_q[0.05].reindex(data['region']).to_numpy()
+    high = temp_q[0.95].reindex(data['region']).to_numpy()
+    temp = data['temp_celsius'].to_numpy()
+    band = np.select([temp <= low, temp >= high, (temp > low) & (temp < high)],
+                     ['extreme_cold_mean', 'extreme_heat_mean', 'normal_temp_mean'], default='')
+    band_means = x.groupby([data['region'], band], observed=True).mean().unstack()
+    band_means = band_means.drop(columns='', errors='ignore')
+    region_stats['temp_p05'] = temp_q[0.05]
+    region_stats['temp_p95'] = temp_q[0.95]
+    region_stats = region_stats.join(band_means)
+
+    # 4. Welch's t-test weekday vs. weekend demand from grouped moments
+    wk = x.groupby([data['region'], data['is_weekend']], observed=True).agg(['mean', 'std', 'count']).unstack()
+    wk = wk.reindex(region_stats.index)
+    t_stat, p_value = ttest_ind_from_stats(
+        *(wk[(stat, 0)].to_numpy(float) for stat in ('mean', 'std', 'count')),
+        *(wk[(stat, 1)].to_numpy(float) for stat in ('mean', 'std', 'count')),
+        equal_var=False)
+    region_stats['weekday_mean'] = wk[('mean', 0)]
+    region_stats['weekend_mean'] = wk[('mean', 1)]
+    region_stats['t_statistic'] = np.asarray(t_stat)
+    region_stats['p_value'] = np.asarray(p_value)
+
+    # 5. Top-k sudden 24h demand changes per region, from a single sort
+    change = (x - data[f'{target}_lag_24h']).rename('demand_change_24h')
+    jumps = data[['region', 'datetime', target, f'{target}_lag_24h']].assign(demand_change_24h=change)
+    jumps = jumps[change.notna()].sort_values('demand_change_24h', ascending=False, kind='stable')
+    grouped_jumps = jumps.groupby('region', observed=True, sort=False)
+    increases = grouped_jumps.head(top_k).assign(direction='increase')
+    decreases = grouped_jumps.tail(top_k).iloc[::-1].assign(direction='decrease')
+    events = pd.concat([increases, decreases])
+    events['rank'] = events.groupby(['region', 'direction'], observed=True).cumcount() + 1
+    events = events.melt(id_vars=['region', 'direction', 'rank', 'datetime'],
+                         value_vars=[target, f'{target}_lag_24h', 'demand_change_24h'],
+                         var_name='column', value_name='value')
+    events['statistic'] = 'top_' + events['direction'] + '.' + events['column']
+
+    region_stats.index.name = 'region'
+    hour_stats.index.names = ['region', 'hour']
+    stats = pd.concat([
+        _tidy(region_stats, ['region']),
+        _tidy(hour_stats, ['region', 'hour']),
+        events[['region', 'rank', 'datetime', 'statistic', 'value']],
+    ], ignore_index=True)
+    stats['region'] = stats['region'].astype(str)
+    stats['hour'] = stats['hour'].astype('Int64')
+    stats['rank'] = stats['rank'].astype('Int64')
+    return stats[STATS_COLUMNS]
+
+
+def region_table(stats: pd.DataFrame) -> pd.DataFrame:
+    """Region-level statistics as one row per region."""
+    rows = stats[stats['hour'].isna() & stats['rank'].isna()]
+    return rows.pivot(index='region', columns='statistic', values='value')
+
+
+def hour_table(stats: pd.DataFrame) -> pd.DataFrame:
+    """(region, hour)-level statistics as one row per region and hour."""
+    rows = stats[stats['hour'].notna()]
+    return rows.pivot(index=['region', 'hour'], columns='statistic', values='value')
+
+
+def top_changes(stats: pd.DataFrame, region: str, direction: str) -> pd.DataFrame:
+    """Top sudden demand changes of one region ('increase' or 'decrease') as a wide table."""
+    prefix = f'top_{direction}.'
+    rows = stats[(stats['region'] == region) & stats['statistic'].str.startswith(prefix)]
+    table = rows.pivot(index=['rank', 'datetime'], columns='statistic', values='value')
+    table.columns = [c[len(prefix):] for c in table.columns]
+    return table.reset_index(level='datetime')
+
+
+def save_eda_stats(stats: pd.DataFrame, path: str = "eda_stats.csv"):
+    stats.to_csv(path, index=False)
+    print(f"Saved EDA statistics ({len(stats)} rows) to {path}")
@@ -0,0 +1,105 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from model_frame import region_slices, feature_matrix, region_file_name
+
+FEATURE_STORE_DIR = "feature_store"
+
+
+def _paths(region: str, store_dir: str):
+    name = region_file_name(region)
+    return os.path.join(store_dir, f"{name}.npy"), os.path.join(store_dir, f"{name}.json")
+
+
+def materialize_region_matrices(df: pd.DataFrame, features: list, store_dir: str = FEATURE_STORE_DIR) -> dict:
+    """
+    Scale each region's features once and write them as a memory-mappable .npy file,
+    with a JSON sidecar holding the row range, feature names and scaler parameters.
+    Returns {region: metadata}.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    X = feature_matrix(df, features)
+
+    all_meta = {}
+    for region, rows in region_slices(df).items():
+        scaler = StandardScaler()
+        scaler.fit(X[rows])
+
+        matrix_path, meta_path = _paths(region, store_dir)
+        matrix = np.lib.format.open_memmap(matrix_path, mode='w+', dtype=np.float32, shape=X[rows].shape)
+        matrix[:] = scaler.transform(X[rows])
+        matrix.flush()
+        del matrix
+
+        meta = {
+            "region": region,
+            "row_start": rows.start,
+            "row_stop": rows.stop,
+            "first_datetime": str(df['datetime'].iloc[rows.start]) if 'datetime' in df.columns else None,
+            "last_datetime": str(df['datetime'].iloc[rows.stop - 1]) if 'datetime' in df.columns else None,
+            "features": list(features),
+            "scaler_mean": scaler.mean_.tolist(),
+            "scaler_scale": scaler.scale_.tolist(),
+        }
+        with open(meta_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        all_meta[region] = meta
+        print(f"  [Store] Wrote scaled {region} matrix {X[rows].shape} to {matrix_path}")
+
+    return all_meta
+
+
+def load_region_matrix(region: str, store_dir: str = FEATURE_STORE_DIR):
+    """Map a region's scaled feature matrix read-only (zero-copy) and load its metadata."""
+    matrix_path, meta_path = _paths(region, store_dir)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return np.load(matrix_path, mmap_mode='r'), meta
+
+
+def stored_region_matrix(region_df: pd.DataFrame, region: str, features: list, store_dir: str = FEATURE_STORE_DIR):
+    """
+    The stored (matrix, metadata) of a region if it was materialized from these rows and features
+    (same feature list, row count and first/last datetime), else None.
+    """
+    matrix_path, meta_path = _paths(region, store_dir)
+    if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+        return None
+    matrix, meta = load_region_matrix(region, store_dir)
+    matches = (meta.get("region") == region and meta["features"] == list(features) and len(matrix) == len(region_df)
+               and 'datetime' in region_df.columns and len(region_df)
+               and meta["first_datetime"] == str(region_df['datetime'].iloc[0])
+               and meta["last_datetime"] == str(region_df['datetime'].iloc[-1]))
+    return (matrix, meta) if matches else None
+
+
+def save_region_params(region: str, params: dict, store_dir: str = FEATURE_STORE_DIR):
+    """Record a region's tuned DBSCAN parameters in its JSON sidecar, for runs that score new rows later (replay)."""
+    _, meta_path = _paths(region, store_dir)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["dbscan_params"] = params
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_region_params(region: str, store_dir: str = FEATURE_STORE_DIR):
+    """Tuned DBSCAN parameters saved for a region, or None."""
+    _, meta_path = _paths(region, store_dir)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f).get("dbscan_params")
+
+
+def unscale(matrix: np.ndarray, meta: dict) -> pd.DataFrame:
+    """Undo the stored scaling, e.g. to show values in their original units."""
+    values = np.asarray(matrix) * np.asarray(meta["scaler_scale"]) + np.asarray(meta["scaler_mean"])
+    index = None
+    if len(values) == meta["row_stop"] - meta["row_start"]:
+        index = pd.RangeIndex(meta["row_start"], meta["row_stop"])
+    return pd.DataFrame(values, columns=meta["features"], index=index)
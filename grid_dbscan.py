@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import KDTree
+
+# Neighbor pairs held in memory at once per partition; radius queries are chunked to stay under it
+EDGE_BUDGET = 2_000_000
+
+
+def _partitions(X: np.ndarray, eps: float, n_parts: int) -> list:
+    """
+    Split the rows into slabs of eps-wide cells along the feature with the widest range, with about
+    the same number of rows per slab. Each slab comes with its halo (one cell on each side), which
+    holds every point within eps of the slab. Returns [(rows, owned)] with `owned` marking the slab's own rows.
+    """
+    axis = int(np.argmax(np.ptp(X, axis=0)))
+    cells = ((X[:, axis] - X[:, axis].min()) // eps).astype(np.int64)
+    order = np.argsort(cells, kind='stable')
+    cell_start = np.r_[0, np.cumsum(np.bincount(cells))]
+    n_cells = len(cell_start) - 1
+
+    # Slab boundaries are the cell boundaries closest to equal row counts
+    targets = np.arange(1, n_parts) * len(X) / n_parts
+    bounds = np.unique(np.r_[0, np.searchsorted(cell_start, targets), n_cells])
+    partitions = []
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        lo, hi = max(first - 1, 0), min(last + 1, n_cells)
+        rows = order[cell_start[lo]:cell_start[hi]]
+        owned = np.zeros(len(rows), dtype=bool)
+        owned[cell_start[first] - cell_start[lo]:cell_start[last] - cell_start[lo]] = True
+        partitions.append((rows, owned))
+    return partitions
+
+
+def _neighbor_counts(X_local: np.ndarray, owned: np.ndarray, eps: float) -> np.ndarray:
+    """Number of points within eps (itself included) of every owned point; no neighbor lists are kept."""
+    return KDTree(X_local).query_radius(X_local[owned], eps, count_only=True)
+
+
+def _find(parent: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """Union-find roots of `nodes`, compressing their paths."""
+    roots = parent[nodes]
+    while True:
+        up = parent[roots]
+        if (up == roots).all():
+            break
+        roots = up
+    parent[nodes] = roots
+    return roots
+
+
+def _chunks(sizes: np.ndarray, budget: int) -> list:
+    """Consecutive index ranges whose sizes add up to about `budget` (at least one item each)."""
+    if len(sizes) == 0:
+        return []
+    ends = np.searchsorted(np.cumsum(sizes), np.arange(budget, sizes.sum() + budget, budget), side='right')
+    ends = np.unique(np.clip(np.r_[ends, len(sizes)], 1, len(sizes)))
+    return list(zip(np.r_[0, ends[:-1]], ends))
+
+
+def _local_clusters(X_local: np.ndarray, owned: np.ndarray, core: np.ndarray, counts: np.ndarray, eps: float):
+    """
+    Connected components of the core points of one slab (halo included) reached from the slab's own
+    core points, and the nearest core point of the slab's own non-core points (-1 = noise).
+    Returns (core positions, their component root positions, border positions, their core position).
+    """
+    core_rows = np.flatnonzero(core)
+    border_rows = np.flatnonzero(owned & ~core)
+    if len(core_rows) == 0:
+        return core_rows, core_rows, border_rows, np.full(len(border_rows), -1)
+    tree = KDTree(X_local[core_rows])
+    parent = np.arange(len(core_rows))
+
+    # Core-core edges within eps, in chunks of about EDGE_BUDGET pairs, merged into the union-find
+    sources = np.flatnonzero(owned[core_rows])
+    for start, stop in _chunks(counts[core_rows[sources]], EDGE_BUDGET):
+        chunk = sources[start:stop]
+        neighbors = tree.query_radius(X_local[core_rows[chunk]], eps)
+        a = np.repeat(_find(parent, chunk), [len(n) for n in neighbors])
+        b = _find(parent, np.concatenate(neighbors))
+        merge = a != b
+        if not merge.any():
+            continue
+        # Merge the touched components: each one points at its smallest root
+        nodes, pairs = np.unique(np.r_[a[merge], b[merge]], return_inverse=True)
+        half = merge.sum()
+        graph = coo_matrix((np.ones(half), (pairs[:half], pairs[half:])), shape=(len(nodes), len(nodes)))
+        _, component = connected_components(graph, directed=False)
+        smallest = np.full(component.max() + 1, len(parent))
+        np.minimum.at(smallest, component, nodes)
+        parent[nodes] = smallest[component]
+    roots = _find(parent, np.arange(len(core_rows)))
+
+    # A non-core point belongs to the cluster of a core point within eps, otherwise it is noise
+    border_core = np.full(len(border_rows), -1)
+    if len(border_rows):
+        distance, nearest = tree.query(X_local[border_rows], k=1)
+        border_core = np.where(distance[:, 0] <= eps, core_rows[nearest[:, 0]], -1)
+    return core_rows, core_rows[roots], border_rows, border_core
+
+
+def grid_dbscan(X: np.ndarray, eps: float, min_samples: int, n_jobs: int = None, n_parts: int = None):
+    """
+    DBSCAN by partitions: the data is cut into slabs of eps-wide cells, core points and local clusters
+    are found per slab in parallel, and clusters that share halo points are merged across slabs.
+    Memory per slab is bounded by EDGE_BUDGET neighbor pairs instead of every neighborhood at once.
+
+    Core and noise points are exactly those of sklearn's DBSCAN; cluster ids may be numbered differently
+    and a border point reachable from two clusters may be given the other one.
+    `n_jobs` = worker processes (None or -1 = every core).
+    Returns (labels with -1 = noise, core mask).
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    n = len(X)
+    labels = np.full(n, -1, dtype=np.int64)
+    core = np.zeros(n, dtype=bool)
+    if n == 0:
+        return labels, core
+    n_jobs = os.cpu_count() if n_jobs is None or n_jobs < 1 else n_jobs
+    partitions = _partitions(X, eps, n_parts or 4 * n_jobs)
+
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 and len(partitions) > 1 else None
+    run = pool.map if pool is not None else map
+    try:
+        # 1. Core points: at least min_samples points within eps (the halo holds all of them)
+        counts = np.empty(n, dtype=np.int64)
+        for (rows, owned), part_counts in zip(partitions, run(
+                _neighbor_counts, (X[rows] for rows, _ in partitions), (owned for _, owned in partitions),
+                [eps] * len(partitions))):
+            counts[rows[owned]] = part_counts
+        core = counts >= min_samples
+
+        # 2. Clusters inside each slab, and the core point each border point attaches to
+        results = run(_local_clusters, (X[rows] for rows, _ in partitions), (owned for _, owned in partitions),
+                      (core[rows] for rows, _ in partitions), (counts[rows] for rows, _ in partitions),
+                      [eps] * len(partitions))
+        edges, borders = [], []
+        for (rows, _), (core_pos, root_pos, border_pos, border_core) in zip(partitions, results):
+            edges.append((rows[core_pos], rows[root_pos]))
+            attached = border_core >= 0
+            borders.append((rows[border_pos[attached]], rows[border_core[attached]]))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # 3. A core point in a halo belongs to two slabs, which joins their clusters
+    points = np.concatenate([edge[0] for edge in edges])
+    roots = np.concatenate([edge[1] for edge in edges])
+    graph = coo_matrix((np.ones(len(points)), (points, roots)), shape=(n, n))
+    _, component = connected_components(graph, directed=False)
+
+    # Number the clusters in order of their first core point, as sklearn does
+    core_rows = np.flatnonzero(core)
+    _, first, cluster = np.unique(component[core_rows], return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    labels[core_rows] = rank[cluster]
+    for border_rows, border_core in borders:
+        labels[border_rows] = labels[border_core]
+    return labels, core
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+from settings import CONFIG
+
+
+def anomaly_features(columns) -> list:
+    """Model features used for anomaly detection: no price and no leakage features, only those present."""
+    return [f for f in CONFIG["features_for_model"]
+            if 'price' not in f and f != 'net_demand_MW' and f in columns]
+
+
+def region_file_name(region: str) -> str:
+    """
+    File-system safe name for a region's files: letters, digits, '-', '_' and '.' are kept, anything else
+    (e.g. '/' or spaces from a catalog) becomes '_', with a short hash of the name so two regions never share a file.
+    """
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', str(region)).strip('.')
+    if slug == region:
+        return slug
+    return f"{slug or 'region'}-{hashlib.sha1(str(region).encode()).hexdigest()[:8]}"
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compact in-memory representation of the dataset:
+    float32 numbers, small integers, categorical region and rows grouped by region.
+    Rows keep their original order inside each region.
+    """
+    dtypes = {col: 'float32' for col in df.select_dtypes(include='float64').columns}
+    for col in df.select_dtypes(include='integer').columns:
+        dtypes[col] = pd.to_numeric(df[col], downcast='integer').dtype
+    df = df.astype(dtypes)
+
+    if 'datetime' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['datetime']):
+        df['datetime'] = pd.to_datetime(df['datetime'])
+
+    if 'region' in df.columns:
+        if not isinstance(df['region'].dtype, pd.CategoricalDtype):
+            # Categories in order of first appearance so grouping keeps the file order
+            df['region'] = pd.Categorical(df['region'], categories=pd.unique(df['region']))
+        codes = df['region'].cat.codes.to_numpy()
+        if (np.diff(codes) < 0).any():
+            df = df.iloc[np.argsort(codes, kind='stable')]
+        df = df.reset_index(drop=True)
+    return df
+
+
+def read_compact_csv(path: str) -> pd.DataFrame:
+    """Read a dataset CSV straight into the compact representation (no float64 copy of the file)."""
+    sample = pd.read_csv(path, nrows=1000)
+    dtypes = {col: 'float32' for col in sample.select_dtypes(include='float').columns}
+    df = pd.read_csv(path, dtype=dtypes)
+    return compact_frame(df)
+
+
+def merge_regions_csv(new_path: str, csv_path: str, chunk_rows: int = 200_000):
+    """
+    Replace the rows of the regions in `new_path` inside the dataset CSV `csv_path`, keeping every other
+    region's saved rows (a `--regions` re-run updates its regions only). Both files are streamed in chunks
+    and values are copied as text, so kept rows are unchanged. Columns follow `new_path`.
+    """
+    if not os.path.exists(csv_path):
+        os.replace(new_path, csv_path)
+        return
+    columns = pd.read_csv(new_path, nrows=0).columns
+    new_regions = set()
+    for chunk in pd.read_csv(new_path, usecols=['region'], dtype=str, chunksize=chunk_rows):
+        new_regions.update(chunk['region'])
+
+    merged_path = csv_path + ".merging"
+    kept = 0
+    with open(merged_path, 'w', newline='') as out:
+        out.write(','.join(columns) + '\n')
+        for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+            chunk = chunk[~chunk['region'].isin(new_regions)].reindex(columns=columns, fill_value='')
+            chunk.to_csv(out, header=False, index=False)
+            kept += len(chunk)
+        with open(new_path) as new:
+            new.readline()
+            shutil.copyfileobj(new, out)
+    os.replace(merged_path, csv_path)
+    os.remove(new_path)
+    print(f"[Data] Updated {sorted(new_regions)} in {csv_path}, kept {kept} rows of the other regions.")
+
+
+def select_regions(df: pd.DataFrame, regions: list = None) -> pd.DataFrame:
+    """Rows of the given regions only (all rows when `regions` is empty), still in compact layout."""
+    if not regions:
+        return df
+    missing = set(regions) - set(df['region'].astype(str))
+    if missing:
+        print(f"[Data] No rows for regions: {sorted(missing)}")
+    subset = compact_frame(df[df['region'].isin(regions)])
+    subset['region'] = subset['region'].cat.remove_unused_categories()
+    return subset
+
+
+def region_slices(df: pd.DataFrame) -> dict:
+    """Contiguous row range of each region in a compact frame, as {region: slice}."""
+    codes = df['region'].cat.codes.to_numpy()
+    if len(codes) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    stops = np.r_[starts[1:], len(codes)]
+    return {df['region'].cat.categories[codes[start]]: slice(int(start), int(stop))
+            for start, stop in zip(starts, stops)}
+
+
+def feature_matrix(df: pd.DataFrame, features: list) -> np.ndarray:
+    """One C-contiguous float32 matrix of the features; slicing it by region_slices gives views."""
+    return np.ascontiguousarray(df[features].to_numpy(dtype=np.float32))
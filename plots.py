@@ -0,0 +1,162 @@
+import matplotlib.pyplot as plt
+import seaborn as sns
+import pandas as pd
+
+# Every function here draws one figure from the data it receives and returns it.
+# They do not import any stage module, so report workers can load them cheaply.
+
+
+def demand_distribution(df: pd.DataFrame):
+    """KDE of demand_MW by region."""
+    fig = plt.figure(figsize=(12, 6), dpi=200)
+    sns.kdeplot(data=df, x='demand_MW', hue='region', fill=True, common_norm=False)
+    plt.title('Distribution of demand_MW by Region')
+    plt.xlabel('Demand (MW)')
+    plt.ylabel('Density')
+    return fig
+
+
+def demand_box_plot(df: pd.DataFrame):
+    """Box plot of demand_MW by region."""
+    fig = plt.figure(figsize=(12, 6), dpi=200)
+    sns.boxplot(data=df, x='demand_MW', y='region')
+    plt.title('Box Plot of demand_MW by Region')
+    plt.xlabel('Demand (MW)')
+    return fig
+
+
+def demand_time_series(df: pd.DataFrame):
+    """Time series of demand_MW by region."""
+    fig = plt.figure(figsize=(18, 6), dpi=200)
+    sns.lineplot(data=df, x='datetime', y='demand_MW', hue='region')
+    plt.title('Time Series of demand_MW by Region')
+    plt.xlabel('Time')
+    plt.ylabel('Demand (MW)')
+    plt.legend(title='Region')
+    plt.grid(True)
+    # This will format the x-axis to show each quarter
+    plt.gca().xaxis.set_major_locator(plt.matplotlib.dates.MonthLocator(interval=2))
+    plt.gca().xaxis.set_major_formatter(plt.matplotlib.dates.DateFormatter('%Y-%m'))
+    fig.autofmt_xdate()
+    return fig
+
+
+def demand_by_hour(df: pd.DataFrame):
+    """Side-by-side boxplots of demand by hour of the day for each region."""
+    fig = plt.figure(figsize=(18, 8), dpi=200)
+    sns.boxplot(data=df, x='hour', y='demand_MW', hue='region')
+    plt.title('Demand Distribution by Hour of the Day for Each Region')
+    plt.xlabel('Hour of the Day')
+    plt.ylabel('Demand (MW)')
+    plt.grid(True)
+    plt.legend(title='Region')
+    return fig
+
+
+def temperature_vs_demand(df: pd.DataFrame):
+    """Scatter plot of temperature vs. demand, colored by region."""
+    fig = plt.figure(figsize=(12, 7), dpi=200)
+    sns.scatterplot(data=df, x='temp_celsius', y='demand_MW', hue='region', alpha=0.6)
+    plt.title('Temperature vs. Demand by Region')
+    plt.xlabel('Temperature (°C)')
+    plt.ylabel('Demand (MW)')
+    plt.grid(True)
+    plt.legend(title='Region')
+    return fig
+
+
+def demand_vs_lagged_demand(df: pd.DataFrame):
+    """Scatter plot of demand against its 24-hour lag, colored by region."""
+    fig = plt.figure(figsize=(10, 10), dpi=200)
+    sns.scatterplot(data=df, x='demand_MW_lag_24h', y='demand_MW', hue='region', alpha=0.5)
+    # Add a reference line for no change
+    min_val = df[['demand_MW', 'demand_MW_lag_24h']].min().min()
+    max_val = df[['demand_MW', 'demand_MW_lag_24h']].max().max()
+    plt.plot([min_val, max_val], [min_val, max_val], 'r--', lw=2, label='No Change')
+    plt.title('Demand vs. 24-Hour Lagged Demand by Region')
+    plt.xlabel('Demand (MW) 24 hours ago')
+    plt.ylabel('Current Demand (MW)')
+    plt.grid(True)
+    plt.legend(title='Region')
+    return fig
+
+
+def weekday_vs_weekend(df: pd.DataFrame):
+    """Violin plot comparing weekday and weekend demand, split by region."""
+    fig = plt.figure(figsize=(12, 7), dpi=200)
+    sns.violinplot(data=df, x='is_weekend', y='demand_MW', hue='region')
+    plt.title('Demand Distribution: Weekday vs. Weekend by Region')
+    plt.xticks([0, 1], ['Weekday', 'Weekend'])
+    plt.xlabel('')
+    plt.ylabel('Demand (MW)')
+    plt.legend(title='Region')
+    return fig
+
+
+def anomalies_by_region(df: pd.DataFrame, model_cols: list):
+    """Plot the demand and outliers for each region."""
+    regions = df['region'].unique()
+    n_regions = len(regions)
+
+    fig, axes = plt.subplots(n_regions, 1, figsize=(20, 8 * n_regions), sharex=True)
+    if n_regions == 1: axes = [axes]
+
+    colors = ['red', 'purple', 'green', 'orange']
+    markers = ['o', 'X', 'P', 's']
+
+    for i, region in enumerate(regions):
+        ax = axes[i]
+        region_df = df[df['region'] == region]
+
+        sns.lineplot(x='datetime', y='demand_MW', data=region_df, ax=ax, color='lightblue', label='Demand', zorder=1)
+
+        for idx, col in enumerate(model_cols):
+            anomalies = region_df[region_df[col] == 1]
+            ax.scatter(anomalies['datetime'], anomalies['demand_MW'],
+                    color=colors[idx % len(colors)],
+                    s=50,
+                    label=f'Anomaly ({col})',
+                    marker=markers[idx % len(markers)],
+                    zorder=2)
+
+        ax.set_title(f'Anomaly Detection in Demand: {region}', fontsize=16)
+        ax.set_ylabel('Demand (MW)')
+        ax.legend()
+        ax.grid(True)
+
+    plt.xlabel('Time', fontsize=12)
+    plt.gca().xaxis.set_major_locator(plt.matplotlib.dates.MonthLocator(interval=2))
+    plt.gca().xaxis.set_major_formatter(plt.matplotlib.dates.DateFormatter('%Y-%m'))
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return fig
+
+
+def shap_summary(shap_values, features_df: pd.DataFrame):
+    """SHAP summary (bar) plot."""
+    import shap  # only the explainability figures need shap
+    plt.figure(figsize=(12, 8), dpi=200)
+    shap.summary_plot(shap_values, features_df, plot_type="bar", show=False)
+    fig = plt.gcf()
+    fig.set_size_inches(12, 6)
+    fig.tight_layout()
+    return fig
+
+
+def shap_waterfall(explanation):
+    """SHAP waterfall plot for a single anomaly."""
+    import shap
+    plt.figure(figsize=(12, 8), dpi=200)
+    shap.waterfall_plot(explanation, show=False)
+    fig = plt.gcf()
+    fig.tight_layout()
+    return fig
+
+
+def shap_dependence(shap_values, color):
+    """SHAP dependence (scatter) plot of one feature, colored by another."""
+    import shap
+    shap.plots.scatter(shap_values, color=color, show=False)
+    fig = plt.gcf()
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,153 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from config_models import (run_lof, run_dbscan, run_isolation_forest, tune_dbscan_hyperparameters,
+                           add_ensemble_columns, model_cols)
+from model_frame import anomaly_features, region_slices, compact_frame, select_regions, read_compact_csv
+from s5_run_models import contamination_rate, ANOMALY_CSV
+from s6_eval import compute_shap, shap_importance, SHAP_SUMMARY
+
+PREVIEW_FILE = "preview_report.csv"
+TOP_SHAP = 5
+
+
+def stratified_sample(df: pd.DataFrame, fraction: float, seed: int = 42) -> pd.DataFrame:
+    """
+    The same fraction of rows from every (region, hour of day, season, weekend) stratum, at least one
+    row per stratum, in the original order.
+    """
+    datetimes = df['datetime']
+    season = datetimes.dt.month % 12 // 3  # 0 = Dec-Feb, 1 = Mar-May, 2 = Jun-Aug, 3 = Sep-Nov
+    weekend = datetimes.dt.dayofweek >= 5
+    strata = pd.DataFrame({'region': df['region'].astype(str), 'hour': datetimes.dt.hour,
+                           'season': season, 'weekend': weekend})
+    stratum = strata.groupby(list(strata.columns), sort=False, observed=True).ngroup().to_numpy()
+
+    # Random order inside each stratum, then keep the first round(fraction * size) rows of each
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(df)), stratum))
+    sizes = np.bincount(stratum)
+    quota = np.maximum(1, np.round(sizes * fraction)).astype(np.int64)
+    rank = np.arange(len(df)) - np.repeat(np.r_[0, np.cumsum(sizes)[:-1]], sizes)
+    keep = np.sort(order[rank < quota[stratum[order]]])
+    return compact_frame(df.iloc[keep])
+
+
+def _detect(df: pd.DataFrame, n_trials: int) -> pd.DataFrame:
+    """All detectors and the ensemble per region, in memory (nothing is written)."""
+    features = anomaly_features(df.columns)
+    flags = {col: np.zeros(len(df), dtype='int8') for col in model_cols}
+    for region, rows in region_slices(df).items():
+        region_df = df.iloc[rows]
+        params = tune_dbscan_hyperparameters(region_df, region, features, n_trials=n_trials)
+        flags['lof_anomaly'][rows] = run_lof(region_df, features, contamination=contamination_rate).to_numpy()
+        flags['dbscan_anomaly'][rows] = run_dbscan(region_df, features, eps=params['eps'],
+                                                   min_samples=params['min_samples']).to_numpy()
+        flags['isolation_forest_anomaly'][rows] = run_isolation_forest(
+            region_df, features, contamination=contamination_rate).to_numpy()
+    df = df.drop(columns=[col for col in df.columns if col in model_cols or col.startswith('ensemble_')])
+    return add_ensemble_columns(df.assign(**flags))
+
+
+def _top_features(importance: pd.DataFrame, region: str, k: int = TOP_SHAP) -> list:
+    ranked = importance[(importance['region'].astype(str) == region) & (importance['rank'] <= k)]
+    return ranked.sort_values('rank')['feature'].tolist()
+
+
+def run_preview(fraction: float = 0.1, regions: list = None, n_trials: int = 10, shap: bool = True,
+                seed: int = 42, output_path: str = PREVIEW_FILE) -> pd.DataFrame:
+    """
+    Run detection, ensemble and SHAP on a stratified subsample of every region and compare the
+    results with the last full run (final_with_anomalies.csv, shap_summary.csv):
+    anomaly rates, agreement of the flags on the sampled hours and overlap of the top SHAP features.
+    Nothing from the full run is overwritten.
+    """
+    start = time.perf_counter()
+    full = None
+    if os.path.exists(ANOMALY_CSV):
+        full = select_regions(read_compact_csv(ANOMALY_CSV), regions)
+        full = add_ensemble_columns(full)
+        base = full
+    else:
+        from s3_save_data import get_base_df
+        print(f"[Preview] No full run ({ANOMALY_CSV}) to compare with; only the preview is reported.")
+        base = select_regions(get_base_df(), regions)
+
+    sample = stratified_sample(base, fraction, seed=seed)
+    print(f"[Preview] Sampled {len(sample)} of {len(base)} rows ({fraction:.0%} per hour/season/weekend stratum).")
+    timings = {'sample_s': time.perf_counter() - start}
+
+    stage = time.perf_counter()
+    preview = _detect(sample, n_trials)
+    timings['detect_s'] = time.perf_counter() - stage
+
+    preview_shap = full_shap = None
+    if shap:
+        stage = time.perf_counter()
+        preview_shap = shap_importance(compute_shap(preview, summary_path=None))
+        timings['shap_s'] = time.perf_counter() - stage
+        if os.path.exists(SHAP_SUMMARY):
+            full_shap = pd.read_csv(SHAP_SUMMARY)
+        else:
+            print(f"[Preview] No {SHAP_SUMMARY} from a full SHAP run; SHAP features are not compared.")
+
+    results = []
+    for region, rows in region_slices(preview).items():
+        region_preview = preview.iloc[rows]
+        row = {'region': region, 'n_preview': len(region_preview)}
+        for col in model_cols + ['ensemble_final_anomaly']:
+            row[f'{col}_rate'] = region_preview[col].mean()
+
+        if full is not None:
+            region_full = full[full['region'] == region]
+            row['n_full'] = len(region_full)
+            # The full run's flags for exactly the sampled hours
+            matched = region_preview[['datetime']].merge(region_full[['datetime'] + model_cols + ['ensemble_final_anomaly']],
+                                                         on='datetime', how='left')
+            for col in model_cols + ['ensemble_final_anomaly']:
+                row[f'{col}_full_rate'] = region_full[col].mean()
+            preview_final = region_preview['ensemble_final_anomaly'].to_numpy()
+            full_final = matched['ensemble_final_anomaly'].fillna(0).to_numpy().astype(int)
+            both = int((preview_final & full_final).sum())
+            either = int((preview_final | full_final).sum())
+            row['ensemble_agreement'] = (preview_final == full_final).mean()
+            row['ensemble_jaccard'] = both / either if either else 1.0
+
+        if preview_shap is not None:
+            top_preview = _top_features(preview_shap, region)
+            row['top_shap_preview'] = ', '.join(top_preview)
+            if full_shap is not None:
+                top_full = _top_features(full_shap, region)
+                row['top_shap_full'] = ', '.join(top_full)
+                row['top_shap_overlap'] = len(set(top_preview) & set(top_full)) / max(len(top_full), 1)
+        results.append(row)
+
+    results = pd.DataFrame(results)
+    for name, value in timings.items():
+        results[name] = value
+    results['total_s'] = time.perf_counter() - start
+    results.to_csv(output_path, index=False)
+
+    print(f"\n--- Preview ({fraction:.0%} sample, {results['total_s'].iloc[0]:.1f}s)"
+          f"{' vs last full run' if full is not None else ''} ---")
+    shap_cols = [col for col in results.columns if col.startswith('top_shap_') and col != 'top_shap_overlap']
+    print(results.drop(columns=list(timings) + ['total_s'] + shap_cols).set_index('region').T.to_string())
+    for row in results.itertuples():
+        for col in shap_cols:
+            print(f"  [Preview] {row.region} {col}: {getattr(row, col)}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fast pipeline preview on a stratified subsample.")
+    parser.add_argument("--fraction", type=float, default=0.1)
+    parser.add_argument("--trials", type=int, default=10, help="DBSCAN tuning trials per region.")
+    parser.add_argument("--no-shap", action="store_true")
+    args = parser.parse_args()
+
+    run_preview(fraction=args.fraction, n_trials=args.trials, shap=not args.no_shap)
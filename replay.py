@@ -0,0 +1,299 @@
+import os
+import time
+import warnings
+
+import holidays
+import numpy as np
+import pandas as pd
+
+from config_models import (fit_detectors, predict_detectors, tune_dbscan_hyperparameters, weights, anomaly_threshold,
+                           model_cols, add_ensemble_columns)
+from feature_store import load_region_params
+from model_frame import anomaly_features, region_slices, read_compact_csv
+from s2_fe import _calculate_heat_index, LOOKBACK_HOURS, TARGETS, ROLLING_REQUESTS
+
+REPLAY_FILE = "replay_results.csv"
+HOUR_NS = 3600 * 10 ** 9
+
+
+class OnlineFeatures:
+    """
+    Incremental equivalent of create_features for one region. Each new hourly row goes into a ring
+    buffer indexed by its absolute hour, so lags and rolling windows are hour lookups (a missing hour
+    stays missing), and the EWMA decays over the hours elapsed since the last observation.
+    """
+
+    def __init__(self, history: pd.DataFrame, ewma_seed: float = None):
+        self.us_holidays = holidays.US()
+        self.requests = ROLLING_REQUESTS
+        self.size = LOOKBACK_HOURS + 1
+        self.values = np.full((self.size, len(TARGETS)), np.nan)   # one row per hour slot
+        self.hours = np.full(self.size, -1, dtype=np.int64)        # absolute hour held by each slot
+        self.ewma = ewma_seed
+        self.ewma_hour = None
+        self.alpha = 2 / (24 + 1)
+        for row in history.itertuples(index=False):
+            pushed = self._push(row._asdict())
+            if pushed is not None:
+                self.ewma_hour = pushed[0]
+
+    def _push(self, row: dict):
+        """Store one raw row under its hour; a repeated hour is ignored (the first row is kept)."""
+        hour = pd.Timestamp(row['datetime']).value // HOUR_NS
+        if self.hours[hour % self.size] == hour:
+            return None
+        values = {target: row.get(target, np.nan) for target in TARGETS}
+        renewables = np.nan_to_num([row.get('wind_gen_MW', 0), row.get('solar_gen_MW', 0)], nan=0.0)
+        values['net_demand_MW'] = row['demand_MW'] - renewables.sum()
+        values = {target: np.nan if value is None else float(value) for target, value in values.items()}
+
+        self.values[hour % self.size] = [values[target] for target in TARGETS]
+        self.hours[hour % self.size] = hour
+        return hour, values
+
+    def _lookup(self, hours: np.ndarray) -> np.ndarray:
+        """Values of the given absolute hours (rows) for every target (columns); NaN where an hour is missing."""
+        slots = hours % self.size
+        found = self.hours[slots] == hours
+        return np.where(found[:, None], self.values[slots], np.nan)
+
+    def update(self, row: dict) -> dict:
+        """
+        Add one raw row (datetime, demand_MW, temp_celsius, humidity_percent, ...) and return its features,
+        or None for a repeated hour.
+        """
+        pushed = self._push(row)
+        if pushed is None:
+            return None
+        now, values = pushed
+        ts = pd.Timestamp(row['datetime'])
+        hour = ts.hour
+
+        features = {
+            'hour_sin': np.sin(2 * np.pi * hour / 24.0),
+            'hour_cos': np.cos(2 * np.pi * hour / 24.0),
+            'day_of_year_sin': np.sin(2 * np.pi * ts.dayofyear / 365.0),
+            'day_of_year_cos': np.cos(2 * np.pi * ts.dayofyear / 365.0),
+            'is_weekend': int(ts.dayofweek in (5, 6)),
+            'is_holiday': int(ts.date() in self.us_holidays),
+            'heat_index_celsius': _calculate_heat_index(values['temp_celsius'], values['humidity_percent']),
+            'net_demand_MW': values['net_demand_MW'],
+        }
+        features['temp_x_hour_sin'] = values['temp_celsius'] * features['hour_sin']
+
+        lags = {lag: self._lookup(np.array([now - lag]))[0] for lag in (24, 168)}
+        history = self._lookup(np.arange(now - max(window for _, window in self.requests) + 1, now + 1))
+        statistics = {
+            'mean': lambda recent, count: np.nanmean(recent, axis=0),
+            'std': lambda recent, count: np.where(count > 1, np.nanstd(recent, axis=0, ddof=1), 0.0),
+            'min': lambda recent, count: np.nanmin(recent, axis=0),
+            'max': lambda recent, count: np.nanmax(recent, axis=0),
+        }
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            stats = {}
+            for stat, window in self.requests:
+                recent = history[-window:]
+                stats[(stat, window)] = statistics[stat](recent, (~np.isnan(recent)).sum(axis=0))
+
+        for j, target in enumerate(TARGETS):
+            for lag in (24, 168):
+                features[f'{target}_lag_{lag}h'] = lags[lag][j]
+            for (stat, window), value in stats.items():
+                features[f'{target}_rolling_{stat}_{window}h'] = value[j]
+
+        demand = values['demand_MW']
+        if self.ewma is None:
+            self.ewma, self.ewma_hour = demand, now
+        elif not np.isnan(demand):
+            # Same recursion as ewm(adjust=False) over the hourly grid: missing hours only decay the old weight
+            old_weight = (1 - self.alpha) ** (now - self.ewma_hour)
+            self.ewma = (old_weight * self.ewma + self.alpha * demand) / (old_weight + self.alpha)
+            self.ewma_hour = now
+        features['demand_ewma_24h'] = self.ewma
+        return features
+
+
+def _percentiles(values) -> dict:
+    values = np.asarray(values) * 1000
+    return {f'p{p}': np.percentile(values, p) for p in (50, 90, 95, 99)} | {'max': values.max()}
+
+
+def _warmup_dbscan_params(train: pd.DataFrame, region: str, features: list, n_trials: int) -> dict:
+    """
+    DBSCAN parameters for one region's warm-up fit: tuned on the warm-up rows (as in the backtest),
+    else those saved by the last batch run in the feature store, else the run_dbscan defaults.
+    """
+    if n_trials > 0:
+        import optuna
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        return tune_dbscan_hyperparameters(train, region, features, n_trials=n_trials)
+    saved = load_region_params(region)
+    if saved is None:
+        print(f"[Replay] {region}: no tuned DBSCAN parameters saved; using eps=1.2, min_samples=5.")
+        return {'eps': 1.2, 'min_samples': 5}
+    return saved
+
+
+def run_replay(df: pd.DataFrame, features: list = None, train_months: int = 12, speedup: float = None,
+               dbscan_params: dict = None, n_trials: int = 20, contamination: float = 0.01, max_events: int = None,
+               output_path: str = REPLAY_FILE) -> pd.DataFrame:
+    """
+    Replay the stored dataset hour by hour as a live monitor.
+    The first `train_months` of each region fit the detectors; every later row is ingested,
+    turned into features, scored and put through the weighted ensemble one at a time.
+    DBSCAN uses `dbscan_params` if given, otherwise it is tuned on the warm-up rows with `n_trials`
+    (0 = the parameters saved by the last batch run).
+    `speedup` replays in scaled real time (e.g. 3600 = one hour per second); None replays as fast as possible.
+    Reports end-to-end latency percentiles, throughput and alert timing versus the batch flags.
+    """
+    features = features if features is not None else anomaly_features(df.columns)
+    raw_cols = [c for c in ['datetime', 'demand_MW', 'temp_celsius', 'humidity_percent',
+                            'price_USD_per_MWh', 'wind_gen_MW', 'solar_gen_MW'] if c in df.columns]
+
+    # 1. Warm-up: fit detectors on each region's first months and prime the online feature state
+    models, online, streams = {}, {}, []
+    for region, rows in region_slices(df).items():
+        region_df = df.iloc[rows]
+        cutoff = region_df['datetime'].iloc[0] + pd.DateOffset(months=train_months)
+        train = region_df[region_df['datetime'] < cutoff]
+        if train.empty or len(train) == len(region_df):
+            print(f"[Replay] Skipping {region}: not enough data around the {train_months}-month warm-up.")
+            continue
+        params = dbscan_params or _warmup_dbscan_params(train, region, features, n_trials)
+        models[region] = fit_detectors(train, features, eps=params['eps'],
+                                       min_samples=params['min_samples'], contamination=contamination)
+        recent = train['datetime'] >= train['datetime'].iloc[-1] - pd.Timedelta(hours=LOOKBACK_HOURS)
+        online[region] = OnlineFeatures(train.loc[recent, raw_cols],
+                                        ewma_seed=float(train['demand_ewma_24h'].iloc[-1]))
+        streams.append(region_df.loc[region_df['datetime'] >= cutoff, raw_cols].assign(region=region))
+        print(f"[Replay] {region}: fitted on {len(train)} rows (DBSCAN eps={params['eps']:.2f}, "
+              f"min_samples={params['min_samples']}), replaying {len(streams[-1])} rows.")
+
+    stream = pd.concat(streams).sort_values(['datetime'], kind='stable')
+    if max_events is not None:
+        stream = stream.head(max_events)
+    weight_vector = np.array([weights[col] for col in model_cols])
+
+    # 2. Stream the events one by one
+    records = []
+    # Events that get no decision: repeated hours, and hours whose lags or windows reach into missing hours
+    skipped = {'repeated_hour': 0, 'missing_inputs': 0}
+    skipped_hours = []
+    first_event_time = stream['datetime'].iloc[0]
+    start_wall = time.perf_counter()
+    for row in stream.to_dict('records'):
+        if speedup:
+            due = start_wall + (row['datetime'] - first_event_time).total_seconds() / speedup
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            arrival = due
+        else:
+            arrival = time.perf_counter()
+
+        region = row['region']
+        t_start = time.perf_counter()
+        feature_row = online[region].update(row)                                   # ingestion + features
+        if feature_row is None:
+            skipped['repeated_hour'] += 1
+            continue
+        t_features = time.perf_counter()
+        x = np.array([[feature_row[f] for f in features]], dtype=np.float32)
+        if np.isnan(x).any():
+            skipped['missing_inputs'] += 1
+            skipped_hours.append((region, row['datetime']))
+            continue
+        flags = predict_detectors(models[region], x, features).iloc[0]             # scoring
+        t_score = time.perf_counter()
+        score = float(flags[model_cols].to_numpy() @ weight_vector)               # ensemble decision
+        final = int(score >= anomaly_threshold)
+        t_done = time.perf_counter()
+
+        records.append({
+            'region': region, 'datetime': row['datetime'],
+            **{col: int(flags[col]) for col in model_cols},
+            'ensemble_weighted_score': score, 'ensemble_final_anomaly': final,
+            'queue_s': t_start - arrival, 'feature_s': t_features - t_start, 'score_s': t_score - t_features,
+            'ensemble_s': t_done - t_score, 'latency_s': t_done - arrival, 'decided_at_s': t_done - start_wall,
+        })
+    wall = time.perf_counter() - start_wall
+
+    results = pd.DataFrame(records)
+    results.to_csv(output_path, index=False)
+
+    # 3. Report (latency and alerts cover the scored events only; skipped ones are counted separately)
+    n_skipped = sum(skipped.values())
+    print(f"\n--- Replay of {len(stream)} events in {wall:.2f}s: {len(results)} scored, {n_skipped} skipped ---")
+    if n_skipped:
+        print(f"  Skipped: {skipped['repeated_hour']} repeated hours, {skipped['missing_inputs']} hours whose lag or "
+              f"rolling inputs are hours the batch stage cleaned away (they are left out of the batch comparison)")
+    print(f"Sustained throughput: {len(stream) / wall:.1f} events/sec ingested, {len(results) / wall:.1f} rows/sec scored")
+    print("Latency percentiles of the scored events (ms):")
+    for stage in ['queue_s', 'feature_s', 'score_s', 'ensemble_s', 'latency_s']:
+        print(f"  {stage[:-2]:>9}: " + ", ".join(f"{k}={v:.2f}" for k, v in _percentiles(results[stage]).items()))
+
+    if all(col in df.columns for col in model_cols):
+        skipped_hours = pd.DataFrame(skipped_hours, columns=['region', 'datetime'])
+        compare_with_batch(results, df, stream[['region', 'datetime']], skipped_hours)
+    return results
+
+
+def compare_with_batch(results: pd.DataFrame, df: pd.DataFrame, replayed: pd.DataFrame = None,
+                       skipped: pd.DataFrame = None):
+    """
+    Alert agreement and timing of the replayed decisions against the batch ensemble, over the same hours:
+    batch rows are limited to the `replayed` (region, datetime) events, minus the `skipped` ones.
+    """
+    from anomaly_store import _events
+
+    batch = add_ensemble_columns(df[['region', 'datetime', 'demand_MW'] + model_cols].copy())
+    batch['region'] = batch['region'].astype(str)
+    if replayed is not None:
+        batch = batch.merge(replayed.drop_duplicates().astype({'region': str}), on=['region', 'datetime'])
+    if skipped is not None and len(skipped):
+        in_skipped = batch.merge(skipped.astype({'region': str}), on=['region', 'datetime'], how='left', indicator=True)
+        dropped = in_skipped['_merge'].to_numpy() == 'both'
+        print(f"\n  [Replay] {dropped.sum()} skipped hours left out of the batch side too "
+              f"({int(batch.loc[dropped, 'ensemble_final_anomaly'].sum())} batch alerts among them).")
+        batch = batch[~dropped]
+    merged = results.merge(batch[['region', 'datetime', 'ensemble_final_anomaly', 'ensemble_weighted_score', 'demand_MW']],
+                           on=['region', 'datetime'], suffixes=('', '_batch'))
+    live, offline = merged['ensemble_final_anomaly'] == 1, merged['ensemble_final_anomaly_batch'] == 1
+    print(f"\n--- Alerts versus batch results over {len(merged)} hours scored by both ---")
+    print(f"  Both: {(live & offline).sum()}, replay only: {(live & ~offline).sum()}, batch only: {(~live & offline).sum()}")
+    if len(merged) < len(batch):
+        print(f"  {len(batch) - len(merged)} replayed batch hours have no replay decision.")
+
+    # For every batch event, how many hours after its start did the replay first alert?
+    delays = []
+    for region, region_merged in merged.groupby('region', sort=False):
+        batch_events = _events(region_merged.assign(
+            ensemble_final_anomaly=region_merged['ensemble_final_anomaly_batch'],
+            ensemble_weighted_score=region_merged['ensemble_weighted_score_batch']))
+        alerts = region_merged.loc[region_merged['ensemble_final_anomaly'] == 1, 'datetime']
+        for event in batch_events.itertuples():
+            hits = alerts[(alerts >= event.start) & (alerts <= event.end)]
+            delays.append((hits.iloc[0] - event.start) / pd.Timedelta(hours=1) if len(hits) else np.nan)
+    delays = pd.Series(delays, dtype=float)
+    if len(delays):
+        print(f"  Batch events caught live: {delays.notna().sum()} / {len(delays)}")
+        if delays.notna().any():
+            print(f"  First-alert delay after event start (hours): median={delays.median():.1f}, max={delays.max():.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay the stored dataset hour by hour as a live monitor.")
+    parser.add_argument("--train-months", type=int, default=12)
+    parser.add_argument("--speedup", type=float, default=None,
+                        help="Replay speed relative to real time (e.g. 3600 = one hour per second). Default: as fast as possible.")
+    parser.add_argument("--max-events", type=int, default=None)
+    parser.add_argument("--trials", type=int, default=20,
+                        help="DBSCAN tuning trials on each warm-up window (0 = parameters saved by the last batch run).")
+    args = parser.parse_args()
+
+    csv_path = "final_with_anomalies.csv" if os.path.exists("final_with_anomalies.csv") else "final_dataset.csv"
+    run_replay(read_compact_csv(csv_path), train_months=args.train_months, speedup=args.speedup,
+               n_trials=args.trials, max_events=args.max_events)
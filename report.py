@@ -0,0 +1,178 @@
+import hashlib
+import html
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = "report_manifest.json"
+INDEX_FILE = "index.html"
+
+
+def _fingerprint(obj, h=None):
+    """Hash the content of the data behind a figure."""
+    h = h if h is not None else hashlib.sha256()
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(pickle.dumps(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name))
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(str((obj.dtype, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else pickle.dumps(obj))
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            _fingerprint(item, h)
+    elif isinstance(obj, dict):
+        for key in sorted(obj):
+            h.update(str(key).encode())
+            _fingerprint(obj[key], h)
+    elif hasattr(obj, "values") and hasattr(obj, "base_values"):
+        # shap.Explanation
+        for attr in ("values", "base_values", "data", "feature_names"):
+            _fingerprint(getattr(obj, attr), h)
+    else:
+        h.update(pickle.dumps(obj))
+    return h
+
+
+def _init_worker():
+    """Force a non-interactive backend in report workers."""
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+def _render_figure(fn, data, kwargs, path, fmt):
+    import matplotlib.pyplot as plt
+
+    fig = fn(*data, **kwargs)
+    fig.savefig(path, format=fmt, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+class Report:
+    """
+    Collects the figures produced by the EDA and explainability stages.
+
+    Without an output directory every figure is drawn, saved to the working
+    directory and shown as soon as it is added (the interactive behavior).
+    With an output directory figures are only queued; `render` then draws them
+    headlessly in worker processes and writes an index page next to them.
+    """
+
+    def __init__(self, output_dir=None, title="Anomaly Detection Report"):
+        self.output_dir = output_dir
+        self.title = title
+        self.figures = []
+
+    def add(self, filename: str, fn, *data, title: str = None, **kwargs):
+        """Add one figure. `fn(*data, **kwargs)` must return a matplotlib figure."""
+        fmt = os.path.splitext(filename)[1].lstrip('.') or 'png'
+
+        if self.output_dir is None:
+            import matplotlib.pyplot as plt
+
+            fig = fn(*data, **kwargs)
+            fig.savefig(filename, format=fmt, bbox_inches='tight')
+            plt.show()
+            plt.close(fig)
+            return
+
+        h = hashlib.sha256(f"{fn.__module__}.{fn.__qualname__}:{sorted(kwargs.items())!r}".encode())
+        self.figures.append({
+            "filename": filename,
+            "title": title or filename,
+            "fn": fn,
+            "data": data,
+            "kwargs": kwargs,
+            "format": fmt,
+            "fingerprint": _fingerprint(list(data), h).hexdigest(),
+        })
+
+    def render(self, n_jobs: int = None) -> list:
+        """Render queued figures whose data changed, then write the index page."""
+        if self.output_dir is None:
+            return []
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+        stale = [
+            fig for fig in self.figures
+            if manifest.get(fig["filename"]) != fig["fingerprint"]
+            or not os.path.exists(os.path.join(self.output_dir, fig["filename"]))
+        ]
+        print(f"[Report] {len(stale)} of {len(self.figures)} figures need rendering.")
+
+        rendered = []
+        if stale:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker) as pool:
+                futures = {
+                    pool.submit(_render_figure, fig["fn"], fig["data"], fig["kwargs"],
+                                os.path.join(self.output_dir, fig["filename"]), fig["format"]): fig
+                    for fig in stale
+                }
+                for future, fig in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"[Report] Failed to render {fig['filename']}: {e}")
+                        manifest.pop(fig["filename"], None)
+                        continue
+                    manifest[fig["filename"]] = fig["fingerprint"]
+                    rendered.append(fig["filename"])
+
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        self._write_index()
+        print(f"[Report] Rendered {len(rendered)} figures into {self.output_dir}")
+        return rendered
+
+    def _write_index(self):
+        items = "\n".join(
+            f'<figure><img src="./{quote(fig["filename"])}" style="max-width:100%">'
+            f'<figcaption>{html.escape(fig["title"])}</figcaption></figure>'
+            for fig in self.figures
+        )
+        with open(os.path.join(self.output_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+            f.write(
+                f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                f"<title>{html.escape(self.title)}</title></head>\n"
+                f"<body><h1>{html.escape(self.title)}</h1>\n{items}\n</body></html>\n"
+            )
+
+
+def build_report(output_dir: str = "report", n_jobs: int = None) -> list:
+    """Render the EDA and explainability figures into one headless report."""
+    from config_models import add_ensemble_columns
+    from s4_eda import eda
+    from s6_eval import get_anomaly_df, compute_shap
+    from s7_shap_analysis import run_shap
+    from s8_examine import deep_analyze_anomalies
+
+    report = Report(output_dir)
+    eda(report)
+    # SHAP values are computed once and shared by both explainability stages
+    df = add_ensemble_columns(get_anomaly_df())
+    shap_results = compute_shap(df)
+    run_shap(report, df, shap_results)
+    deep_analyze_anomalies(report, df, shap_results)
+    return report.render(n_jobs=n_jobs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render all figures headlessly into one report directory.")
+    parser.add_argument("--output-dir", default="report")
+    parser.add_argument("--jobs", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args()
+
+    build_report(args.output_dir, n_jobs=args.jobs)
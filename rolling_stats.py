@@ -0,0 +1,129 @@
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from scipy.signal import lfilter
+
+ROLLING_STATS = ('mean', 'std', 'min', 'max')
+
+
+def _window_sums(cumulative: np.ndarray, window: int) -> np.ndarray:
+    """Trailing-window sums along the rows of a zero-prepended cumulative sum; the first hours use what is available."""
+    k, n = cumulative.shape[0], cumulative.shape[1] - 1
+    out = np.empty((k, n))
+    out[:, :window - 1] = cumulative[:, 1:window]
+    np.subtract(cumulative[:, window:], cumulative[:, :-window], out=out[:, window - 1:])
+    return out
+
+
+def _cumsum(x: np.ndarray) -> np.ndarray:
+    out = np.zeros((x.shape[0], x.shape[1] + 1))
+    np.cumsum(x, axis=1, out=out[:, 1:])
+    return out
+
+
+def rolling_stats(values: np.ndarray, requests) -> dict:
+    """
+    Trailing rolling statistics of every column of `values` (rows = consecutive hours, NaN = missing)
+    for the requested (stat, window) pairs, e.g. [('mean', 24), ('max', 168)]. Same semantics as pandas
+    rolling(window, min_periods=1), with std NaN below two values. Returns {(stat, window): array shaped like `values`}.
+
+    Each column is laid out contiguously. Mean and std come from one set of cumulative sums shared
+    by all windows; the columns are centered on their mean first, which keeps the sums small and
+    limits cancellation in the variance. Min and max use scipy's monotonic-wedge running filters.
+    """
+    requests = set(requests)
+    unknown = {stat for stat, _ in requests} - set(ROLLING_STATS)
+    if unknown:
+        raise ValueError(f"Unknown rolling statistics {sorted(unknown)} (choose from {ROLLING_STATS})")
+    stats = {stat for stat, _ in requests}
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    x = np.ascontiguousarray(values.T)
+    n = x.shape[1]
+    valid = ~np.isnan(x)
+    complete = valid.all()
+
+    results = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        count = valid.sum(axis=1, keepdims=True)
+        shift = np.where(count > 0, np.where(valid, x, 0.0).sum(axis=1, keepdims=True) / np.maximum(count, 1), 0.0)
+        centered = x - shift
+        if not complete:
+            centered[~valid] = 0.0
+        cum_sum = _cumsum(centered) if stats & {'mean', 'std'} else None
+        cum_sq = _cumsum(centered * centered) if 'std' in stats else None
+        cum_count = None if complete else _cumsum(valid)
+        low = np.where(valid, x, np.inf) if 'min' in stats and not complete else x
+        high = np.where(valid, x, -np.inf) if 'max' in stats and not complete else x
+
+        for window in sorted({window for _, window in requests}):
+            wanted = {stat for stat, w in requests if w == window}
+            if complete:
+                counts = np.minimum(np.arange(1, n + 1), window).astype(np.float64)
+            else:
+                counts = _window_sums(cum_count, window)
+            if 'mean' in wanted or 'std' in wanted:
+                sums = _window_sums(cum_sum, window)
+                sums /= counts
+            if 'mean' in wanted:
+                mean = sums + shift
+                if not complete:
+                    mean[counts == 0] = np.nan
+                results[('mean', window)] = mean.T
+            if 'std' in wanted:
+                # Sum of squares around the window mean: sum(c^2) - n * mean_c^2
+                var = _window_sums(cum_sq, window)
+                sums *= sums
+                sums *= counts
+                var -= sums
+                np.maximum(var, 0.0, out=var)
+                var /= counts - 1
+                np.sqrt(var, out=var)
+                var[np.broadcast_to(counts < 2, var.shape)] = np.nan
+                results[('std', window)] = var.T
+            # A trailing window is the filter footprint shifted back by (window - 1) // 2 hours
+            origin = (window - 1) // 2
+            if 'min' in wanted:
+                running = minimum_filter1d(low, window, axis=1, origin=origin, mode='constant', cval=np.inf)
+                if not complete:
+                    running[counts == 0] = np.nan
+                results[('min', window)] = running.T
+            if 'max' in wanted:
+                running = maximum_filter1d(high, window, axis=1, origin=origin, mode='constant', cval=-np.inf)
+                if not complete:
+                    running[counts == 0] = np.nan
+                results[('max', window)] = running.T
+    return results
+
+
+def ewma(values: np.ndarray, span: float, seed: tuple = None) -> np.ndarray:
+    """
+    Same as pd.Series(values).ewm(span=span, adjust=False).mean() over consecutive hours with NaN gaps:
+    a missing hour only decays the weight of the past. Each run of observed hours is one linear
+    filter pass. `seed` = (value, hours before the first row) continues an earlier EWMA.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2 / (span + 1)
+    out = np.full(len(values), np.nan)
+
+    observed = np.flatnonzero(~np.isnan(values))
+    previous, previous_pos = (None, None) if seed is None else (seed[0], -seed[1])
+    run_starts = np.flatnonzero(np.r_[True, np.diff(observed) > 1]) if len(observed) else []
+    run_stops = np.r_[run_starts[1:], len(observed)] if len(observed) else []
+    for start, stop in zip(run_starts, run_stops):
+        first, last = observed[start], observed[stop - 1]
+        x = values[first:last + 1]
+        if previous is None:
+            y0 = x[0]
+        else:
+            old_weight = (1 - alpha) ** (first - previous_pos)
+            y0 = (old_weight * previous + alpha * x[0]) / (old_weight + alpha)
+        out[first] = y0
+        if len(x) > 1:
+            out[first + 1:last + 1] = lfilter([alpha], [1, -(1 - alpha)], x[1:], zi=[(1 - alpha) * y0])[0]
+        previous, previous_pos = out[last], last
+
+    # Hours without a value carry the last EWMA forward (as pandas does)
+    positions = np.maximum.accumulate(np.where(np.isnan(out), -1, np.arange(len(out))))
+    out = np.where(positions >= 0, out[np.maximum(positions, 0)], np.nan if seed is None else seed[0])
+    return out
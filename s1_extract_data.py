@@ -1,12 +1,101 @@
+import json
+import os
+import random
+import shutil
+import time
+from email.utils import parsedate_to_datetime
+
 import requests
 import pandas as pd
 import numpy as np
 import holidays
 
+# Completed EIA pages are kept here so an interrupted crawl resumes where it stopped
+CHECKPOINT_DIR = "eia_checkpoints"
+PAGE_SIZE = 5000
+MAX_RETRIES = 8
+BACKOFF_BASE_S = 2.0
+BACKOFF_MAX_S = 300.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Pause between requests: doubled after each throttled/failed attempt, halved after each success
+_pace = {"delay_s": 0.0}
+
+
+def _retry_after(response) -> float:
+    """Seconds asked for by a Retry-After header (either delta-seconds or an HTTP date), or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max((parsedate_to_datetime(value) - pd.Timestamp.now(tz="UTC")).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+def _get_with_backoff(url: str, params: dict, max_retries: int = MAX_RETRIES) -> requests.Response:
+    """
+    GET with retries on HTTP 429/5xx and connection errors.
+    Waits what the server asks for in Retry-After, otherwise exponential backoff with jitter,
+    and slows the pace of later requests while the server keeps pushing back.
+    Other HTTP errors are raised at once.
+    """
+    for attempt in range(max_retries + 1):
+        response = None
+        time.sleep(_pace["delay_s"])
+        try:
+            response = requests.get(url, params=params, timeout=60)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                _pace["delay_s"] = _pace["delay_s"] / 2 if _pace["delay_s"] > 0.05 else 0.0
+                return response
+            error = requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error = e
+        _pace["delay_s"] = min(max(_pace["delay_s"] * 2, 0.5), 30.0)
+        if attempt == max_retries:
+            raise error
+
+        wait = _retry_after(response)
+        if wait is None:
+            wait = random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+        print(f"  [Retry] {error}; retrying in {wait:.1f}s ({attempt + 1}/{max_retries})")
+        time.sleep(wait)
+
+
+def _write_json_atomic(path: str, payload):
+    """Write JSON to a temporary file and move it into place, so a crash never leaves a half-written file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _load_checkpoint(crawl_dir: str):
+    """Records of the pages committed so far, the next offset and the manifest of a crawl."""
+    manifest_path = os.path.join(crawl_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return [], 0, {}
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    records = []
+    for offset in manifest["pages"]:
+        with open(os.path.join(crawl_dir, f"page_{offset:09d}.json")) as f:
+            records.extend(json.load(f))
+    return records, manifest["next_offset"], manifest
+
 
 def fetch_eia_data(api_key, region_code, start_date, end_date, data_type) -> pd.DataFrame:
     """
     Function to get data from EIA.
+    Pages are checkpointed under CHECKPOINT_DIR as they arrive, so an interrupted crawl resumes
+    from the last committed offset, and the row count is checked against the API's reported total.
     """
     # Config endpoint and facet based on data_type
     endpoint_config = {
@@ -45,29 +134,62 @@ def fetch_eia_data(api_key, region_code, start_date, end_date, data_type) -> pd.
         "end": end_date,
         "sort[0][column]": "period",
         "sort[0][direction]": "asc",
-        "length": 5000
+        "length": PAGE_SIZE
     }
 
     for key, value in facet_filters.items():
         base_params[f"facets[{key}][]"] = value
 
-    all_records = []
-    offset = 0
-    while True:
+    # Checkpointed crawl: every completed page is written to disk before the offset moves on
+    crawl_dir = os.path.join(CHECKPOINT_DIR, f"{data_type}_{region_code}_{start_date}_{end_date}")
+    os.makedirs(crawl_dir, exist_ok=True)
+    all_records, offset, manifest = _load_checkpoint(crawl_dir)
+    if manifest.get("complete"):
+        print(f"  [EIA] {data_type} for {region_code}: using {len(all_records)} checkpointed rows.")
+    elif offset:
+        print(f"  [EIA] {data_type} for {region_code}: resuming at offset {offset}.")
+
+    total = manifest.get("total")
+    while not manifest.get("complete"):
         params = base_params.copy()
         params["offset"] = offset
         try:
-            r = requests.get(api_endpoint, params=params)
-            r.raise_for_status()
-            data = r.json()["response"]["data"]
-            if not data:
-                break
-            all_records.extend(data)
-            offset += len(data)
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching EIA {data_type} data for {region_code}: {e}")
+            response = _get_with_backoff(api_endpoint, params)
+            body = response.json()["response"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            print(f"Error fetching EIA {data_type} data for {region_code} at offset {offset}: {e}")
+            print(f"  [EIA] {offset} rows are checkpointed in {crawl_dir}; re-run to resume.")
             return pd.DataFrame()
 
+        reported_total = int(body.get("total", 0) or 0)
+        if total is not None and reported_total != total:
+            # The result set changed under us: the stored offsets no longer line up, start over
+            print(f"  [EIA] Reported total changed from {total} to {reported_total}; restarting the crawl.")
+            shutil.rmtree(crawl_dir)
+            os.makedirs(crawl_dir)
+            all_records, offset, manifest = [], 0, {}
+            total = None
+            continue
+        total = reported_total
+
+        data = body["data"]
+        if not data:
+            break
+        _write_json_atomic(os.path.join(crawl_dir, f"page_{offset:09d}.json"), data)
+        manifest = {
+            "total": total,
+            "next_offset": offset + len(data),
+            "pages": manifest.get("pages", []) + [offset],
+            "complete": offset + len(data) >= total,
+        }
+        _write_json_atomic(os.path.join(crawl_dir, "manifest.json"), manifest)
+        all_records.extend(data)
+        offset += len(data)
+
+    if total is not None and len(all_records) != total:
+        print(f"  [EIA] Warning: {data_type} for {region_code} has {len(all_records)} rows, "
+              f"but the API reported {total}.")
+
     if not all_records:
         return pd.DataFrame()
 
@@ -91,8 +213,7 @@ def fetch_weather(lat, lon, start_date, end_date) -> pd.DataFrame:
         "hourly": "temperature_2m,relative_humidity_2m"
     }
     try:
-        r = requests.get("https://archive-api.open-meteo.com/v1/archive", params=params)
-        r.raise_for_status()
+        r = _get_with_backoff("https://archive-api.open-meteo.com/v1/archive", params)
         data = r.json()
         df = pd.DataFrame(data["hourly"])
         df["datetime"] = pd.to_datetime(df["time"])
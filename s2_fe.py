@@ -1,6 +1,42 @@
+import os
+import re
 import pandas as pd
 import numpy as np
 import holidays
+from settings import CONFIG
+from rolling_stats import rolling_stats, ewma, ROLLING_STATS
+
+TARGETS = ['demand_MW', 'temp_celsius', 'humidity_percent', 'price_USD_per_MWh', 'net_demand_MW']
+
+
+def rolling_requests(features_for_model: list = None) -> list:
+    """
+    The (stat, window) rolling columns to build for every target: CONFIG["rolling_stats"] plus
+    any rolling column that the model features ask for.
+    """
+    features_for_model = CONFIG["features_for_model"] if features_for_model is None else features_for_model
+    pattern = re.compile(rf"_rolling_({'|'.join(ROLLING_STATS)})_(\d+)h$")
+    requests = [(stat, int(window)) for stat, window in CONFIG["rolling_stats"]]
+    for feature in features_for_model:
+        match = pattern.search(feature)
+        if match and (match.group(1), int(match.group(2))) not in requests:
+            requests.append((match.group(1), int(match.group(2))))
+    return requests
+
+
+ROLLING_REQUESTS = rolling_requests()
+
+# Longest lookback of any feature (the 168h lag or the longest rolling window); chunked feature
+# engineering overlaps chunks by this many hours
+LOOKBACK_HOURS = max(168, max(window for _, window in ROLLING_REQUESTS) - 1)
+
+
+def feature_column_count(n_input_cols: int) -> int:
+    """
+    Columns of a feature frame built from `n_input_cols` raw columns: 14 calendar, weather and
+    net demand columns, then per target two lags and the rolling columns, and the EWMA.
+    """
+    return n_input_cols + 14 + len(TARGETS) * (2 + len(ROLLING_REQUESTS)) + 1
 
 def _calculate_heat_index(temp_c, humidity):
     """Calculate the Heat Index (feels hot)."""
@@ -11,20 +47,69 @@ def _calculate_heat_index(temp_c, humidity):
          + 8.5282e-4 * temp_f * humidity**2 - 1.99e-6 * temp_f**2 * humidity**2
     return (hi - 32) * 5/9
 
-def create_features(df: pd.DataFrame, features_for_model: list) -> pd.DataFrame:
+def hourly_grid(datetimes: pd.Series, start=None):
     """
-    Generates features from aggregated data.
-    This function will not fail if columns are missing.
+    Place time-ordered, de-duplicated timestamps on a regular hourly grid starting at `start`
+    (default: the first timestamp). Returns each row's slot and the validity mask of the grid
+    (True where an hour has a row), so an hour `k` back from row i is simply slot[i] - k.
+    Raises ValueError for timestamps between the hours (sub-hourly data) or repeated/unsorted hours,
+    which would otherwise share a slot and silently keep only one row per hour.
+    """
+    start = datetimes.iloc[0] if start is None else pd.Timestamp(start)
+    offsets = (datetimes - start).to_numpy()
+    off_grid = np.flatnonzero(offsets % np.timedelta64(1, 'h') != np.timedelta64(0))
+    if len(off_grid):
+        raise ValueError(f"hourly_grid needs one row per whole hour, but {len(off_grid)} of {len(offsets)} timestamps "
+                         f"fall between hours (first: {datetimes.iloc[off_grid[0]]}); resample sub-hourly data to hourly first")
+    slots = (offsets // np.timedelta64(1, 'h')).astype(np.int64)
+    not_increasing = np.flatnonzero(np.diff(slots) <= 0)
+    if len(not_increasing):
+        raise ValueError(f"hourly_grid needs strictly increasing hours, but {len(not_increasing)} rows repeat or precede "
+                         f"the previous hour (first: {datetimes.iloc[not_increasing[0] + 1]})")
+    valid = np.zeros(slots[-1] + 1 if len(slots) else 0, dtype=bool)
+    valid[slots] = True
+    return slots, valid
+
+def gap_stats(datetimes: pd.Series, previous=None) -> dict:
+    """
+    Missing and repeated hours of a time-ordered series of timestamps.
+    `previous` is the last timestamp seen before `datetimes` (to count a gap across chunks).
     """
-    df = df.sort_values("datetime").copy()
+    times = datetimes if previous is None else pd.concat([pd.Series([pd.Timestamp(previous)]), datetimes])
+    steps = times.diff().dropna() / pd.Timedelta(hours=1)
+    missing = (steps[steps > 1] - 1).astype(int)
+    return {
+        "rows": len(datetimes),
+        "duplicate_rows": int((steps == 0).sum()),
+        "missing_hours": int(missing.sum()),
+        "gaps": len(missing),
+        "longest_gap_h": int(missing.max()) if len(missing) else 0,
+    }
+
+def _print_gap_stats(stats: dict):
+    expected = stats["rows"] - stats["duplicate_rows"] + stats["missing_hours"]
+    print(f"  [FE] Hourly grid: {expected} hours, {stats['missing_hours']} missing in {stats['gaps']} gaps "
+          f"(longest {stats['longest_gap_h']}h), {stats['duplicate_rows']} repeated hours dropped.")
+
+def _add_features(df: pd.DataFrame, ewma_seed: tuple = None) -> pd.DataFrame:
+    """
+    Adds all feature columns to a time-ordered frame and returns it.
+    Repeated hours are dropped (the first row is kept); lags and rollings are taken in hours on a dense
+    hourly grid, so missing hours leave NaN lags instead of shifting rows into the wrong hour.
+    `ewma_seed` is the (datetime, value) of the EWMA at the row just before `df`, used to continue it across chunks.
+    """
+    if df['datetime'].duplicated().any():
+        df = df[~df['datetime'].duplicated()].copy()
 
     # 1. & 2. Time-based & Cyclical features
     df['hour'] = df['datetime'].dt.hour
     df['day_of_week'] = df['datetime'].dt.dayofweek
     df['day_of_year'] = df['datetime'].dt.dayofyear
     df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-    us_holidays = holidays.US()
-    df['is_holiday'] = df['datetime'].dt.date.astype('datetime64[ns]').isin(us_holidays).astype(int)
+    # holidays.US() is filled lazily per year, so ask for the years explicitly
+    years = range(df['datetime'].dt.year.min(), df['datetime'].dt.year.max() + 1)
+    us_holidays = pd.to_datetime(list(holidays.US(years=years).keys()))
+    df['is_holiday'] = df['datetime'].dt.normalize().isin(us_holidays).astype(int)
     df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24.0)
     df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24.0)
     df['day_of_year_sin'] = np.sin(2 * np.pi * df['day_of_year'] / 365.0)
@@ -44,16 +129,50 @@ def create_features(df: pd.DataFrame, features_for_model: list) -> pd.DataFrame:
     df['temp_x_hour_sin'] = df['temp_celsius'] * df['hour_sin']
 
     # 6. Lag and Rolling features
-    targets = ['demand_MW', 'temp_celsius', 'humidity_percent', 'price_USD_per_MWh', 'net_demand_MW']
-    for target in targets:
-        if target not in df.columns:
-            continue
+    # All targets share one dense hourly grid (hours x targets); every requested rolling column of
+    # every target comes out of a single rolling_stats pass over it
+    slots, valid = hourly_grid(df['datetime'])
+    targets = [target for target in TARGETS if target in df.columns]
+    grid = np.full((len(valid), len(targets)), np.nan)
+    grid[slots] = df[targets].to_numpy(dtype=float)
+
+    new_columns = {}
+    for j, target in enumerate(targets):
         for lag in [24, 168]:
-            df[f'{target}_lag_{lag}h'] = df[target].shift(lag)
-        df[f'{target}_rolling_mean_24h'] = df[target].rolling(window=24, min_periods=1).mean()
-        df[f'{target}_rolling_std_24h'] = df[target].rolling(window=24, min_periods=1).std().fillna(0)
+            lagged = np.full(len(slots), np.nan)
+            has_lag = slots >= lag
+            lagged[has_lag] = grid[slots[has_lag] - lag, j]
+            new_columns[f'{target}_lag_{lag}h'] = lagged
 
-    df['demand_ewma_24h'] = df['demand_MW'].ewm(span=24, adjust=False).mean()
+    # Missing hours are NaN on the grid, so each window only summarizes the hours that exist
+    every_hour = len(slots) == len(valid)
+    for (stat, window), values in rolling_stats(grid, ROLLING_REQUESTS).items():
+        for j, target in enumerate(targets):
+            column = values[:, j] if every_hour else values[slots, j]
+            new_columns[f'{target}_rolling_{stat}_{window}h'] = np.nan_to_num(column) if stat == 'std' else column
+
+    seed = None
+    if ewma_seed is not None:
+        # The seed sits at its own hour before the grid so the decay across the gap is kept
+        seed_time, seed_value = ewma_seed
+        seed = (seed_value, int((df['datetime'].iloc[0] - pd.Timestamp(seed_time)) // pd.Timedelta(hours=1)))
+    new_columns['demand_ewma_24h'] = ewma(grid[:, targets.index('demand_MW')], span=24, seed=seed)[slots]
+
+    return pd.concat([df, pd.DataFrame(new_columns, index=df.index)], axis=1)
+
+def _clean(df: pd.DataFrame, features_for_model: list) -> pd.DataFrame:
+    """Drop rows with NaN in the model features that are actually available."""
+    available_cols_for_model = [col for col in features_for_model if col in df.columns]
+    return df.dropna(subset=available_cols_for_model).reset_index(drop=True)
+
+def create_features(df: pd.DataFrame, features_for_model: list) -> pd.DataFrame:
+    """
+    Generates features from aggregated data.
+    This function will not fail if columns are missing.
+    """
+    df = df.sort_values("datetime", kind="stable").copy()
+    _print_gap_stats(gap_stats(df['datetime']))
+    df = _add_features(df)
 
     print(f"  [FE] Before cleaning: df has {len(df)} rows.")
 
@@ -64,12 +183,78 @@ def create_features(df: pd.DataFrame, features_for_model: list) -> pd.DataFrame:
         print(f"  [FE] NaNs in demand_lag_168h: {df['demand_MW_lag_168h'].isna().sum()}")
 
     # 7. Cleaning data
-    # Identify the columns that are actually available for cleaning and modeling
-    available_cols_for_model = [col for col in features_for_model if col in df.columns]
-
     # Only drop rows with NaN in the columns we will actually use
     # This prevents data loss if only the price column is missing
-    df_cleaned = df.dropna(subset=available_cols_for_model).reset_index(drop=True)
+    df_cleaned = _clean(df, features_for_model)
 
     print(f"  [FE] After cleaning: df has {len(df_cleaned)} rows.")
-    return df_cleaned
\ No newline at end of file
+    return df_cleaned
+
+def create_features_chunked(chunks, features_for_model: list, output_path: str, overlap: int = LOOKBACK_HOURS,
+                            extra_columns: dict = None, append: bool = False) -> int:
+    """
+    Out-of-core version of create_features for one region.
+    `chunks` is an iterable of time-ordered DataFrames (e.g. pd.read_csv(..., chunksize=n)).
+    Each chunk is processed together with the raw rows of the previous `overlap` hours, so lags
+    and rollings see the same history as in memory, and the EWMA is carried over exactly.
+    Features (plus the constant `extra_columns`, e.g. {'region': 'ERCOT'}) are written to
+    `output_path` chunk by chunk, after its existing rows when `append`. Returns the number of rows written.
+    """
+    if os.path.exists(output_path) and not append:
+        os.remove(output_path)
+
+    carry = None        # raw rows of the last `overlap` hours of the previous chunk
+    carry_seed = None   # (datetime, EWMA) of the row just before `carry`
+    last_datetime = None
+    rows_in = rows_out = 0
+    totals = {"rows": 0, "duplicate_rows": 0, "missing_hours": 0, "gaps": 0, "longest_gap_h": 0}
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        chunk = chunk.copy()
+        chunk['datetime'] = pd.to_datetime(chunk['datetime'])
+        if not chunk['datetime'].is_monotonic_increasing or (
+                last_datetime is not None and chunk['datetime'].iloc[0] < last_datetime):
+            raise ValueError("create_features_chunked needs input sorted by datetime.")
+        stats = gap_stats(chunk['datetime'], previous=last_datetime)
+        for key, value in stats.items():
+            totals[key] = max(totals[key], value) if key == "longest_gap_h" else totals[key] + value
+        previous_datetime, last_datetime = last_datetime, chunk['datetime'].iloc[-1]
+        rows_in += len(chunk)
+
+        frame = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+        frame = frame.reset_index(drop=True)
+        raw_cols = list(frame.columns)
+
+        frame = _add_features(frame, ewma_seed=carry_seed).reset_index(drop=True)
+
+        # The next chunk restarts from the raw rows of the last `overlap` hours of this frame
+        keep_from = int(np.searchsorted(frame['datetime'].to_numpy(),
+                                        (last_datetime - pd.Timedelta(hours=overlap)).to_datetime64(), side='right'))
+        carry = frame.loc[keep_from:, raw_cols].reset_index(drop=True)
+        if keep_from > 0:
+            carry_seed = (frame['datetime'].iloc[keep_from - 1], frame['demand_ewma_24h'].iloc[keep_from - 1])
+
+        new_rows = frame if previous_datetime is None else frame[frame['datetime'] > previous_datetime]
+        out = _clean(new_rows, features_for_model)
+        if extra_columns:
+            out = out.assign(**extra_columns)
+        out.to_csv(output_path, mode='a', header=not os.path.exists(output_path), index=False,
+                   date_format='%Y-%m-%d %H:%M:%S')
+        rows_out += len(out)
+
+    _print_gap_stats(totals)
+    print(f"  [FE] Chunked: {rows_in} input rows -> {rows_out} feature rows written to {output_path}")
+    return rows_out
+
+def create_features_from_csv(input_path: str, output_path: str, features_for_model: list,
+                             memory_limit_mb: float = 256, extra_columns: dict = None, append: bool = False) -> int:
+    """Chunked feature engineering of one region's time-ordered merged CSV within a rough memory ceiling."""
+    n_input_cols = len(pd.read_csv(input_path, nrows=0).columns)
+    # pandas needs a few temporary copies per feature column
+    bytes_per_row = feature_column_count(n_input_cols) * 8 * 3
+    chunk_rows = max(int(memory_limit_mb * 1024 ** 2 / bytes_per_row) - LOOKBACK_HOURS, LOOKBACK_HOURS)
+    print(f"  [FE] Processing {input_path} in chunks of {chunk_rows} rows.")
+    return create_features_chunked(pd.read_csv(input_path, chunksize=chunk_rows), features_for_model, output_path,
+                                   extra_columns=extra_columns, append=append)
\ No newline at end of file
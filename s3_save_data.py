@@ -1,15 +1,25 @@
-from settings import CONFIG
+from settings import CONFIG, load_region_catalog
 from s1_extract_data import fetch_eia_data, fetch_weather
-from s2_fe import create_features
+from s2_fe import create_features, create_features_from_csv
+from model_frame import read_compact_csv, merge_regions_csv, region_file_name
 import pandas as pd 
 import os
 
-def save_data_pipeline():
-    """Pipeline to fetch, merge, create features, and save data for all regions."""
-    
-    all_final_dfs = []  # reset mỗi lần chạy
-    
-    for region_name, region_info in CONFIG["regions"].items():
+# One raw (merged demand + weather) CSV per region, sorted by datetime, so each can be streamed on its own
+RAW_DIR = "raw"
+
+def raw_path(region_name: str, raw_dir: str = RAW_DIR) -> str:
+    return os.path.join(raw_dir, f"{region_file_name(region_name)}.csv")
+
+def ingest_regions(regions: dict = None, raw_dir: str = RAW_DIR) -> list:
+    """Fetch and merge demand and weather for each region and write them to one raw CSV per region."""
+
+    # Each region is written and dropped, so only one region is in memory at a time
+    regions = regions if regions is not None else load_region_catalog()
+    os.makedirs(raw_dir, exist_ok=True)
+    ingested = []
+
+    for region_name, region_info in regions.items():
         print(f"\nProcessing region: {region_name}")
         region_code = region_info["code"]
         lat = region_info["lat"]
@@ -18,35 +28,75 @@ def save_data_pipeline():
         # Fetch data
         demand_df = fetch_eia_data(CONFIG["api_key"], region_code, CONFIG["start_date"], CONFIG["end_date"], 'demand')
         weather_df = fetch_weather(lat, lon, CONFIG["start_date"], CONFIG["end_date"])
+        if demand_df.empty or weather_df.empty:
+            print(f"  [Skip] No data for {region_name}.")
+            continue
 
         # Merge
-        merged_df = pd.merge(demand_df, weather_df, on="datetime", how="left")
+        merged_df = pd.merge(demand_df, weather_df, on="datetime", how="left").sort_values("datetime", kind="stable")
         print(f"  [Merge] Merged df has {len(merged_df)} rows.")
 
+        merged_df.to_csv(raw_path(region_name, raw_dir), index=False, date_format='%Y-%m-%d %H:%M:%S')
+        ingested.append(region_name)
+        del demand_df, weather_df, merged_df
+
+    return ingested
+
+def raw_regions(raw_dir: str = RAW_DIR) -> list:
+    """Regions with a raw CSV, in catalog order (then any other files by name)."""
+    if not os.path.isdir(raw_dir):
+        return []
+    available = {name[:-len(".csv")] for name in os.listdir(raw_dir) if name.endswith(".csv")}
+    ordered = [name for name in load_region_catalog() if region_file_name(name) in available]
+    return ordered + sorted(available - {region_file_name(name) for name in ordered})
+
+def build_features(raw_dir: str = RAW_DIR, csv_path: str = "final_dataset.csv", regions: list = None,
+                   memory_limit_mb: float = None):
+    """
+    Create features for each region's raw CSV and append them to the dataset CSV.
+    With `regions`, only those regions are rebuilt and the saved rows of the others are kept.
+    With `memory_limit_mb`, each region is streamed in chunks that fit the limit (create_features_from_csv)
+    instead of being loaded whole.
+    """
+    names = [name for name in raw_regions(raw_dir) if not regions or name in regions]
+    output_path = csv_path + ".new" if regions else csv_path
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    total_rows = 0
+
+    for region_name in names:
+        print(f"\nCreating features for region: {region_name}")
+        if memory_limit_mb:
+            total_rows += create_features_from_csv(raw_path(region_name, raw_dir), output_path, CONFIG["features_for_model"],
+                                                   memory_limit_mb, extra_columns={'region': region_name}, append=True)
+            continue
+
         # FE
+        merged_df = pd.read_csv(raw_path(region_name, raw_dir), parse_dates=['datetime'])
         final_df = create_features(merged_df, CONFIG["features_for_model"])
         final_df['region'] = region_name
-        all_final_dfs.append(final_df)
 
-    # Combine all regions
-    combined_final_df = pd.concat(all_final_dfs, ignore_index=True)
-    print(f"\nCombined final df has {len(combined_final_df)} rows.")
-    print(f"Columns in final df: {combined_final_df.columns.tolist()}")
+        # Save file
+        final_df.to_csv(output_path, mode='a', header=not os.path.exists(output_path), index=False)
+        total_rows += len(final_df)
+        del merged_df, final_df
 
-    # Save file
-    combined_final_df.to_csv("final_dataset.csv", index=False)
-    return combined_final_df
+    print(f"\nCombined final df has {total_rows} rows.")
+    if regions and total_rows:
+        merge_regions_csv(output_path, csv_path)
+    return read_compact_csv(csv_path)
+
+def save_data_pipeline(csv_path: str = "final_dataset.csv", regions: dict = None):
+    """Pipeline to fetch, merge, create features, and save data for all regions."""
+    ingested = ingest_regions(regions)
+    return build_features(RAW_DIR, csv_path, regions=ingested)
 
 def get_base_df():
     csv_path = "final_dataset.csv"
 
     if os.path.exists(csv_path):
         print("Loading base dataset (no anomalies)…")
-        return pd.read_csv(csv_path)
+        return read_compact_csv(csv_path)
 
     print("📥 Base dataset missing → running pipeline…")
-    df = save_data_pipeline()
-    df.to_csv(csv_path, index=False)
-    return df
-
-df = get_base_df()
\ No newline at end of file
+    return save_data_pipeline(csv_path)
@@ -1,73 +1,104 @@
+import os
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import DBSCAN
-from config_models import run_lof, run_isolation_forest, tune_dbscan_hyperparameters, run_dbscan
-from settings import CONFIG
-from s3_save_data import df
+from config_models import run_lof, run_isolation_forest, tune_dbscan_hyperparameters, run_dbscan, model_cols
+from model_frame import anomaly_features, select_regions, merge_regions_csv
+from feature_store import materialize_region_matrices, load_region_matrix, save_region_params
+from s3_save_data import get_base_df
+from drift import run_drift_monitor
 
 
 contamination_rate = 0.01  # 1% anomalies
-features_for_anomaly = [f for f in CONFIG["features_for_model"] if 'price' not in f and f != 'net_demand_MW']
-features_for_anomaly = [f for f in features_for_anomaly if f in df.columns]
-
-print(f"Loaded dataset with {len(df)} rows.")
-
-def run_models():
+ANOMALY_CSV = "final_with_anomalies.csv"
+
+def _previous_flags(df: pd.DataFrame, columns: list, csv_path: str = ANOMALY_CSV) -> pd.DataFrame:
+    """All detector flags set to 0, except `columns`, which are taken from the last saved results (0 where missing)."""
+    flags = pd.DataFrame(0, index=df.index, columns=model_cols, dtype='int8')
+    if not columns:
+        return flags
+    if not os.path.exists(csv_path):
+        print(f"  [Model] No saved results for {columns}; their flags are set to 0.")
+        return flags
+    previous = pd.read_csv(csv_path, usecols=['region', 'datetime'] + columns, parse_dates=['datetime'])
+    keys = df[['region', 'datetime']].astype({'region': str})
+    merged = keys.merge(previous.astype({'region': str}), on=['region', 'datetime'], how='left')
+    missing = merged[columns[0]].isna().sum()
+    if missing:
+        print(f"  [Model] {missing} rows have no saved {columns} flags; they are set to 0.")
+    flags[columns] = merged[columns].fillna(0).astype('int8').to_numpy()
+    return flags
+
+def run_models(df: pd.DataFrame = None, regions: list = None, detectors: list = None):
+    """
+    Run the detectors per region and save final_with_anomalies.csv.
+    `regions` and `detectors` restrict the run; detectors that are not run keep their saved flags
+    and regions that are not run keep their saved rows.
+    """
+    df = select_regions(get_base_df() if df is None else df, regions)
+    detectors = detectors or model_cols
     # Remove price related features and leakage features
-    features_for_anomaly = [f for f in CONFIG["features_for_model"] if 'price' not in f and f != 'net_demand_MW']
-    features_for_anomaly = [f for f in features_for_anomaly if f in df.columns]
+    features_for_anomaly = anomaly_features(df.columns)
 
+    print(f"Loaded dataset with {len(df)} rows.")
     print(f"Using {len(features_for_anomaly)} features for anomaly detection.")
     print(f"Features: {features_for_anomaly}")
 
+    # Scale each region's features once into a memory-mapped file shared by every detector and trial
+    store_meta = materialize_region_matrices(df, features_for_anomaly)
+
     # Hyperparameter tuning for DBSCAN per region (this part is already correct)
     best_dbscan_params = {}
-    for region in df['region'].unique():
-        region_df = df[df['region'] == region]
-        best_params = tune_dbscan_hyperparameters(region_df, region, features_for_anomaly, n_trials=50)
-        best_dbscan_params[region] = best_params
-
-    contamination_rate = 0.01  # 1% anomalies
-
-    # Initialize the anomaly columns to 0 first
-    df['lof_anomaly'] = 0
-    df['isolation_forest_anomaly'] = 0
-    df['dbscan_anomaly'] = 0
+    if 'dbscan_anomaly' in detectors:
+        for region in store_meta:
+            region_matrix, _ = load_region_matrix(region)
+            best_params = tune_dbscan_hyperparameters(region_matrix, region, features_for_anomaly, n_trials=50, scaled=True)
+            best_dbscan_params[region] = best_params
+            save_region_params(region, best_params)
+
+    # Start from 0 (or the saved flags of the detectors that are not re-run)
+    flags = _previous_flags(df, [col for col in model_cols if col not in detectors])
+    lof_anomaly = flags['lof_anomaly'].to_numpy(copy=True)
+    isolation_forest_anomaly = flags['isolation_forest_anomaly'].to_numpy(copy=True)
+    dbscan_anomaly = flags['dbscan_anomaly'].to_numpy(copy=True)
 
     # Loop through each region to run all models
-    for region in df['region'].unique():
+    for region, meta in store_meta.items():
         print(f"\n--- Running all models for region: {region} ---")
 
-        # Create a boolean mask to identify the rows for the current region
-        region_mask = df['region'] == region
-
-        # Get the features for just this region
-        region_features = df.loc[region_mask, features_for_anomaly]
+        # Map the scaled features of just this region (zero-copy)
+        region_features, _ = load_region_matrix(region)
+        rows = slice(meta["row_start"], meta["row_stop"])
 
         # 1. Run Local Outlier Factor for the region
-        lof_predictions = run_lof(region_features, features_for_anomaly, contamination=contamination_rate)
-        df.loc[region_mask, 'lof_anomaly'] = lof_predictions
-        print(f"  [Model] Local Outlier Factor found {df.loc[region_mask, 'lof_anomaly'].sum()} outliers.")
-
-        params = best_dbscan_params[region]
-        print(f"  [Model] Running DBSCAN with params: {params}")
-
-        # predictions đã là 0/1 với 1 = outlier từ run_dbscan
-        predictions = run_dbscan(region_features, features_for_anomaly, eps=params['eps'], min_samples=params['min_samples'])
-
-        # Gán trực tiếp vào dataframe
-        df.loc[region_mask, 'dbscan_anomaly'] = predictions
-
-        print(f"  [Model] DBSCAN found {df.loc[region_mask, 'dbscan_anomaly'].sum()} outliers.")
-
-        # 3. Run Isolation Forest for the region
-        iso_forest_predictions = run_isolation_forest(region_features, features_for_anomaly, contamination=contamination_rate)
-        df.loc[region_mask, 'isolation_forest_anomaly'] = iso_forest_predictions
-        print(f"  [Model] Isolation Forest found {df.loc[region_mask, 'isolation_forest_anomaly'].sum()} outliers.")
-
+        if 'lof_anomaly' in detectors:
+            lof_anomaly[rows] = run_lof(region_features, features_for_anomaly, contamination=contamination_rate, scaled=True)
+            print(f"  [Model] Local Outlier Factor found {lof_anomaly[rows].sum()} outliers.")
+
+        # 2. Run DBSCAN, predictions are already 0/1 with 1 = outlier
+        if 'dbscan_anomaly' in detectors:
+            params = best_dbscan_params[region]
+            print(f"  [Model] Running DBSCAN with params: {params}")
+            dbscan_anomaly[rows] = run_dbscan(region_features, features_for_anomaly, eps=params['eps'], min_samples=params['min_samples'], scaled=True)
+            print(f"  [Model] DBSCAN found {dbscan_anomaly[rows].sum()} outliers.")
+
+        # 3. Run Isolation Forest for the region (tree splits are unaffected by the scaling)
+        if 'isolation_forest_anomaly' in detectors:
+            isolation_forest_anomaly[rows] = run_isolation_forest(region_features, features_for_anomaly, contamination=contamination_rate)
+            print(f"  [Model] Isolation Forest found {isolation_forest_anomaly[rows].sum()} outliers.")
+
+    df['lof_anomaly'] = lof_anomaly
+    df['isolation_forest_anomaly'] = isolation_forest_anomaly
+    df['dbscan_anomaly'] = dbscan_anomaly
 
     print("\n--- Anomaly detection completed for all models and all regions. ---")
     print(f"Total LOF Anomalies: {df['lof_anomaly'].sum()}")
     print(f"Total DBSCAN Anomalies: {df['dbscan_anomaly'].sum()}")
     print(f"Total Isolation Forest Anomalies: {df['isolation_forest_anomaly'].sum()}")
-    df.to_csv("final_with_anomalies.csv", index=False)
+
+    # Month-by-month shift of the detector inputs against the rest of the history they were fitted on
+    run_drift_monitor(df, features_for_anomaly)
+    if regions:
+        df.to_csv(ANOMALY_CSV + ".new", index=False)
+        merge_regions_csv(ANOMALY_CSV + ".new", ANOMALY_CSV)
+    else:
+        df.to_csv(ANOMALY_CSV, index=False)
+    return df
@@ -1,72 +1,50 @@
 import pandas as pd
-from sklearn.ensemble import IsolationForest
 import numpy as np
-from s5_run_models import features_for_anomaly, contamination_rate, run_models
-from s3_save_data import get_base_df, df
-import shap
+from s5_run_models import contamination_rate, run_models, ANOMALY_CSV
+from model_frame import read_compact_csv, region_slices, anomaly_features, select_regions
+from config_models import model_cols, weights, anomaly_threshold, add_ensemble_columns
+from anomaly_store import append_scores
 import os
 
 
-def get_anomaly_df(df):
-    csv_path = "final_with_anomalies.csv"
+def get_anomaly_df():
+    csv_path = ANOMALY_CSV
 
     # If already exists → load
     if os.path.exists(csv_path):
         print("✅ Loading anomaly dataset…")
-        return pd.read_csv(csv_path)
+        return read_compact_csv(csv_path)
 
     print("⚠️ No anomaly dataset → running models…")
-    df = get_base_df()
-    df = run_models()  # must save final_with_anomalies.csv inside
-    return pd.read_csv(csv_path)
+    run_models()  # must save final_with_anomalies.csv inside
+    return read_compact_csv(csv_path)
 
-df = get_anomaly_df(df)
 
-model_cols = ['lof_anomaly', 'dbscan_anomaly', 'isolation_forest_anomaly']
-    
+def run_eval(df: pd.DataFrame = None, regions: list = None, detectors: list = None):
+    """Print anomaly counts per region and detector, build the ensemble and append it to the anomaly store."""
+    df = select_regions(get_anomaly_df() if df is None else df, regions)
+    detectors = detectors or model_cols
 
-
-def run_eval():
     # Overall anomaly counts
     print("\nAnomaly counts by region and model:")
-    for region in df['region'].unique():
-        region_df = df[df['region'] == region]
+    for region, rows in region_slices(df).items():
+        region_df = df.iloc[rows]
         print(f"\nRegion: {region}")
-        for col in model_cols:
+        for col in detectors:
             count = region_df[col].sum()
             print(f"  {col}: {count} anomalies")
             percent = (count / len(region_df)) * 100
             print(f"    Percentage: {percent:.4f}%")
 
-    # Generate simple ensemble score
-    df['ensemble_score_simple'] = df[model_cols].sum(axis=1)
+    # Generate simple and weighted ensemble scores
+    add_ensemble_columns(df)
     print("\nSimple aggregate anomaly score distribution:")
     print(df['ensemble_score_simple'].value_counts().sort_index())
 
     # Advanced Ensemble
     print("\n--- Advanced Ensemble Anomaly Detection ---")
-
-    # We trust LOF and Isolation Forest more, so we weight them higher
-    weights = {
-        'lof_anomaly': 0.4,
-        'dbscan_anomaly': 0.2,
-        'isolation_forest_anomaly': 0.4
-    }
     print("Weights for ensemble:", weights)
-
-    # Weight anomaly scores
-    df['ensemble_weighted_score'] = (
-        df['lof_anomaly'] * weights['lof_anomaly'] +
-        df['dbscan_anomaly'] * weights['dbscan_anomaly'] +
-        df['isolation_forest_anomaly'] * weights['isolation_forest_anomaly']
-    )
-
-    # Define threshold to decide which is the final anomaly
-    # We consider a point an anomaly if at least ONE of the reliable models
-    # (LOF or Isolation Forest) flags it. Since their weight is 0.4, any score >= 0.4 indicates at least one flagged it.
-    anomaly_threshold = 0.4
     print(f"Anomaly threshold set at: {anomaly_threshold}")
-    df['ensemble_final_anomaly'] = (df['ensemble_weighted_score'] >= anomaly_threshold).astype(int)
 
     # Compare results
     print("\n --- Compare the number of anomaly points ---")
@@ -76,73 +54,75 @@ def run_eval():
     print(f"  - Simple Ensemble (>=1 vote): {(df['ensemble_score_simple'] >= 1).sum()}")
     print(f"  - Weighted Ensemble (final): {df['ensemble_final_anomaly'].sum()}")
 
-    # Analysis SHAP for Isolation Forest
-    import shap
-
-    # Dictionaries to hold the results for each region
-    all_shap_values = {}
-    all_features_df = {}
-    all_explainers = {}
-
-    # Loop through each region to perform a separate SHAP analysis
-    for region in df['region'].unique():
-        print(f"\n--- Running SHAP Analysis for region: {region} ---")
-
-        # 1. Isolate the data for the current region
-        region_df = df[df['region'] == region].copy()
+    # Append the scored hours and merged anomaly events to the indexed store
+    append_scores(df)
+    return df
 
-        # 2. Find the anomalies detected by the region-specific Isolation Forest
-        anomalies_df = region_df[region_df['isolation_forest_anomaly'] == 1].copy()
-        features_df = anomalies_df[features_for_anomaly]
+SHAP_SUMMARY = "shap_summary.csv"
 
-        # Only run SHAP if there are anomalies detected for this region
-        if not anomalies_df.empty:
-            # 3. Create and retrain an Isolation Forest model ONLY on this region's data
-            # This ensures the explainer uses the same logic that found the anomalies
-            isolation_model = IsolationForest(n_estimators=200, contamination=contamination_rate, random_state=42)
-            isolation_model.fit(region_df[features_for_anomaly])
 
-            # 4. Create an explainer using the region-specific model and background data
-            explainer = shap.Explainer(isolation_model, region_df[features_for_anomaly])
+def shap_importance(shap_results) -> pd.DataFrame:
+    """Mean |SHAP| of every feature over each region's anomalies, ranked per region (1 = most important)."""
+    all_shap_values, all_features_df, _ = shap_results
+    rows = []
+    for region, shap_values in all_shap_values.items():
+        importance = pd.Series(np.abs(shap_values.values).mean(axis=0), index=all_features_df[region].columns)
+        importance = importance.sort_values(ascending=False)
+        rows.append(pd.DataFrame({'region': region, 'feature': importance.index,
+                                  'mean_abs_shap': importance.to_numpy(), 'rank': np.arange(1, len(importance) + 1)}))
+    return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=['region', 'feature', 'mean_abs_shap', 'rank'])
 
-            # 5. Calculate SHAP values for the anomalies found in this region
-            shap_values = explainer(features_df)
 
-            # 6. Store the results in our dictionaries
-            all_shap_values[region] = shap_values
-            all_features_df[region] = features_df
-            all_explainers[region] = explainer
-            print(f"  SHAP analysis complete for {len(features_df)} anomalies in {region}.")
-        else:
-            print(f"  No anomalies detected by Isolation Forest in {region}; skipping SHAP analysis.")
+def compute_shap(df, summary_path: str = SHAP_SUMMARY):
+    """
+    Compute SHAP values separately for each region.
+    The per-region feature ranking is saved to `summary_path` (None = not saved).
+    """
+    # shap and the forest are only imported when explanations are actually needed
+    import shap
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+    from feature_store import stored_region_matrix
 
-def compute_shap(df):
-    """Compute SHAP values separately for each region."""
+    features_for_anomaly = anomaly_features(df.columns)
     all_shap_values = {}
     all_features_df = {}
     all_explainers = {}
 
-    for region in df['region'].unique():
+    for region, rows in region_slices(df).items():
         print(f"\n--- SHAP for {region} ---")
 
-        region_df = df[df['region'] == region].copy()
-        anomalies_df = region_df[region_df['isolation_forest_anomaly'] == 1].copy()
+        region_df = df.iloc[rows]
+        anomalies_df = region_df[region_df['isolation_forest_anomaly'] == 1]
 
         if anomalies_df.empty:
             print("  No anomalies. Skipping ✅")
             continue
 
-        # Train region-specific model
+        # Scaled features mapped from the feature store when they were materialized from these rows;
+        # otherwise (e.g. a preview sample) scaled here, leaving the store untouched
+        stored = stored_region_matrix(region_df, region, features_for_anomaly)
+        if stored is not None:
+            region_matrix = stored[0]
+        else:
+            print("  [Store] No stored matrix for these rows; scaling in memory.")
+            region_matrix = StandardScaler().fit_transform(region_df[features_for_anomaly].to_numpy())
+        anomaly_positions = np.flatnonzero(region_df['isolation_forest_anomaly'].to_numpy() == 1)
+
+        # Train region-specific model (tree splits, and so SHAP values, are unaffected by the scaling)
         model = IsolationForest(
             n_estimators=200,
             contamination=contamination_rate,
             random_state=42
         )
-        model.fit(region_df[features_for_anomaly])
+        model.fit(region_matrix)
 
         features_df = anomalies_df[features_for_anomaly]
-        explainer = shap.Explainer(model, region_df[features_for_anomaly])
-        shap_values = explainer(features_df)
+        explainer = shap.Explainer(model, region_matrix)
+        shap_values = explainer(np.asarray(region_matrix[anomaly_positions]))
+        # Plots show the features in their original units
+        shap_values.data = features_df.to_numpy()
+        shap_values.feature_names = list(features_for_anomaly)
 
         all_shap_values[region] = shap_values
         all_features_df[region] = features_df
@@ -150,6 +130,7 @@ def compute_shap(df):
 
         print(f"  ✅ SHAP completed for {len(features_df)} anomaly points")
 
-    return all_shap_values, all_features_df, all_explainers
-
-all_shap_values, all_features_df, all_explainers = compute_shap(df)
\ No newline at end of file
+    shap_results = all_shap_values, all_features_df, all_explainers
+    if summary_path:
+        shap_importance(shap_results).to_csv(summary_path, index=False)
+    return shap_results
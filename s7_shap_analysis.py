@@ -1,73 +1,27 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-import shap
 import pandas as pd
-from s6_eval import model_cols
-from s6_eval import all_shap_values, all_features_df, all_explainers, get_anomaly_df,df
+import plots
+from report import Report
+from config_models import model_cols, add_ensemble_columns
+from s6_eval import get_anomaly_df, compute_shap
 import os
 
 
-df = get_anomaly_df(df)
-
-def run_shap():
-    def plot_anomalies_by_region(df: pd.DataFrame, model_cols: list, output_filename: str):
-        """Plot the demand and outliers for each region."""
-        regions = df['region'].unique()
-        n_regions = len(regions)
-
-        fig, axes = plt.subplots(n_regions, 1, figsize=(20, 8 * n_regions), sharex=True)
-        if n_regions == 1: axes = [axes]
-
-        colors = ['red', 'purple', 'green', 'orange']
-        markers = ['o', 'X', 'P', 's']
-
-        for i, region in enumerate(regions):
-            ax = axes[i]
-            region_df = df[df['region'] == region]
-
-            sns.lineplot(x='datetime', y='demand_MW', data=region_df, ax=ax, color='lightblue', label='Demand', zorder=1)
-
-            for idx, col in enumerate(model_cols):
-                anomalies = region_df[region_df[col] == 1]
-                ax.scatter(anomalies['datetime'], anomalies['demand_MW'],
-                        color=colors[idx % len(colors)],
-                        s=50,
-                        label=f'Anomaly ({col})',
-                        marker=markers[idx % len(markers)],
-                        zorder=2)
-
-            ax.set_title(f'Anomaly Detection in Demand: {region}', fontsize=16)
-            ax.set_ylabel('Demand (MW)')
-            ax.legend()
-            ax.grid(True)
-
-        plt.xlabel('Time', fontsize=12)
-        plt.gca().xaxis.set_major_locator(plt.matplotlib.dates.MonthLocator(interval=2))
-        plt.gca().xaxis.set_major_formatter(plt.matplotlib.dates.DateFormatter('%Y-%m'))
-        plt.gcf().autofmt_xdate()
-        plt.tight_layout()
-        plt.savefig(output_filename, format='png', bbox_inches='tight')
-        plt.show()
-
-    def plot_shap_summary(shap_values, features_df: pd.DataFrame, output_filename):
-        """Plot SHAP summary."""
-        if shap_values is None: return
-
-        print("Displaying SHAP summary plot for anomalies...")
-        fig = plt.figure(figsize=(12, 8), dpi=200)
-        shap.summary_plot(shap_values, features_df, plot_type="bar", show=False)
-        fig = plt.gcf()
-        fig.set_size_inches(12, 6)
-        plt.tight_layout()
-        plt.savefig(output_filename, format='png', bbox_inches='tight')
-        plt.show()
+def run_shap(report: Report = None, df: pd.DataFrame = None, shap_results: tuple = None, detectors: list = None):
+    # Without a report every figure is shown as soon as it is drawn
+    report = report if report is not None else Report()
+    df = add_ensemble_columns(get_anomaly_df() if df is None else df)
+    all_shap_values, all_features_df, _ = shap_results if shap_results is not None else compute_shap(df)
+    detectors = detectors or model_cols
 
     # Run visualizations
-    plot_anomalies_by_region(df, model_cols, output_filename='anomalies_by_region.png')
+    report.add('anomalies_by_region.png', plots.anomalies_by_region,
+               df[['region', 'datetime', 'demand_MW'] + detectors], detectors,
+               title='Anomalies by Region')
 
-    plot_df = df.copy()
-    plot_df.rename(columns={'ensemble_final_anomaly': 'Final Anomaly (Weighted)'}, inplace=True)
-    plot_anomalies_by_region(plot_df, ['Final Anomaly (Weighted)'], output_filename='final_anomalies_by_region.png')
+    plot_df = df[['region', 'datetime', 'demand_MW', 'ensemble_final_anomaly']].rename(
+        columns={'ensemble_final_anomaly': 'Final Anomaly (Weighted)'})
+    report.add('final_anomalies_by_region.png', plots.anomalies_by_region,
+               plot_df, ['Final Anomaly (Weighted)'], title='Final (Weighted) Anomalies by Region')
 
     for region in df['region'].unique():
         if region in all_shap_values:
@@ -78,11 +32,9 @@ def run_shap():
             region_features_df = all_features_df[region]
 
             # Create the plot with a region-specific filename
-            plot_shap_summary(
-                region_shap_values,
-                region_features_df,
-                f'shap_summary_{region}.png'
-            )
+            print("Displaying SHAP summary plot for anomalies...")
+            report.add(f'shap_summary_{region}.png', plots.shap_summary,
+                       region_shap_values, region_features_df, title=f'SHAP Summary: {region}')
         else:
             print(f"\n--- No SHAP values to plot for {region} ---")
 
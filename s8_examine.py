@@ -1,15 +1,20 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import shap
-from s6_eval import model_cols, all_shap_values, all_explainers, all_features_df, get_anomaly_df, df
+import plots
+from report import Report
+from config_models import add_ensemble_columns
+from s6_eval import get_anomaly_df, compute_shap
 from IPython.display import display
 import os
 
-df= get_anomaly_df(df)
-print("--- Start deep analysis of anomalies ---")
 
-def deep_analyze_anomalies():
+def deep_analyze_anomalies(report: Report = None, df: pd.DataFrame = None, shap_results: tuple = None):
+    print("--- Start deep analysis of anomalies ---")
+    # Without a report every figure is shown as soon as it is drawn
+    report = report if report is not None else Report()
+    df = add_ensemble_columns(get_anomaly_df() if df is None else df)
+    all_shap_values, all_features_df, all_explainers = shap_results if shap_results is not None else compute_shap(df)
+
     # Loop through each region to perform a separate deep analysis
     for region in df['region'].unique():
         print(f"\n--- Starting deep analysis of anomalies for {region} ---")
@@ -60,12 +65,8 @@ def deep_analyze_anomalies():
                 )
 
                 # Create and save the waterfall plot
-                plt.figure(figsize=(12, 8), dpi=200)
-                shap.waterfall_plot(explanation_object, show=False)
-                plt.tight_layout()
-                plt.savefig(f"anomaly_{i}_{region}_index_{event_index}_shap_waterfall.svg", bbox_inches='tight', format='svg')
-                plt.show()
-                plt.close()
+                report.add(f"anomaly_{i}_{region}_index_{event_index}_shap_waterfall.svg", plots.shap_waterfall,
+                           explanation_object, title=f'SHAP Waterfall: anomaly #{i} in {region} (index {event_index})')
 
             except KeyError:
                 print(f"Error: Index {event_index} not found in the {region} SHAP dataset. This is unexpected but can happen.")
@@ -88,42 +89,24 @@ def deep_analyze_anomalies():
         # --- Feature 1: Temperature (heat_index_celsius) for this region ---
         print(f"  Plotting relationship for Heat Index in {region}...")
 
-        shap.plots.scatter(
-            shap_values_for_region[:, "heat_index_celsius"],
-            color=shap_values_for_region[:, "demand_MW_rolling_mean_24h"],
-            show=False
-        )
-
-        # Get the current figure and save it with a region-specific name
-        fig = plt.gcf()
-        fig.tight_layout()
+        # Save the plot with a region-specific name
         output_filename = f'shap_dependence_heat_index_{region}.svg'
         print(f"  Saving plot to: {output_filename}")
-        fig.savefig(output_filename, bbox_inches='tight', format='svg')
-
-        # Show and then close the figure to prepare for the next plot
-        plt.show()
-        plt.close(fig)
+        report.add(output_filename, plots.shap_dependence,
+                   shap_values_for_region[:, "heat_index_celsius"],
+                   shap_values_for_region[:, "demand_MW_rolling_mean_24h"],
+                   title=f'SHAP Dependence: Heat Index ({region})')
 
         # --- Feature 2: Demand Volatility for this region ---
         print(f"  Plotting relationship for Demand Volatility in {region}...")
 
-        shap.plots.scatter(
-            shap_values_for_region[:, "demand_MW_rolling_std_24h"],
-            color=shap_values_for_region[:, "temp_celsius_lag_24h"],
-            show=False
-        )
-
-        # Get the current figure and save it with a region-specific name
-        fig = plt.gcf()
-        fig.tight_layout()
+        # Save the plot with a region-specific name
         output_filename_2 = f'shap_dependence_demand_std_{region}.svg'
         print(f"  Saving plot to: {output_filename_2}")
-        fig.savefig(output_filename_2, bbox_inches='tight', format='svg')
-
-        # Show and close the final plot for this region
-        plt.show()
-        plt.close(fig)
+        report.add(output_filename_2, plots.shap_dependence,
+                   shap_values_for_region[:, "demand_MW_rolling_std_24h"],
+                   shap_values_for_region[:, "temp_celsius_lag_24h"],
+                   title=f'SHAP Dependence: Demand Volatility ({region})')
 
 if __name__ == "__main__":
     deep_analyze_anomalies()
\ No newline at end of file
@@ -0,0 +1,193 @@
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+from settings import CONFIG, load_region_catalog
+from model_frame import region_file_name
+
+SCHEDULER_DIR = "regions_output"
+
+# Raw columns of a merged region (datetime, demand, weather, generation, price, region)
+RAW_COLUMNS = 8
+
+
+def bytes_per_row() -> int:
+    """
+    Rough bytes per hourly row held at the peak of one region's run: every float column of the
+    feature frame, times a few temporary copies in feature engineering and detector neighbor structures.
+    """
+    from s2_fe import feature_column_count
+    return feature_column_count(RAW_COLUMNS) * 8 * 6
+
+
+def estimate_region_mb(start_date: str = None, end_date: str = None) -> float:
+    """Peak memory estimate (MB) for processing one region over the configured date range."""
+    start = pd.Timestamp(start_date or CONFIG["start_date"])
+    end = pd.Timestamp(end_date or CONFIG["end_date"])
+    hours = (end - start) / pd.Timedelta(hours=1) + 24
+    return hours * bytes_per_row() / 1024 ** 2
+
+
+def process_region(region_name: str, region_info: dict, output_dir: str = SCHEDULER_DIR,
+                   n_trials: int = 50, contamination: float = 0.01, feature_memory_mb: float = None) -> dict:
+    """
+    ingest -> features -> detect -> ensemble for one region, then persist and drop the frames.
+    With `feature_memory_mb`, features are built out of core (create_features_from_csv) within that limit.
+    Only a small summary is returned to the scheduler.
+    """
+    # Heavy stage modules are imported in the worker so the scheduler process stays small
+    from s1_extract_data import fetch_eia_data, fetch_weather
+    from s2_fe import create_features, create_features_from_csv
+    from model_frame import compact_frame, anomaly_features, read_compact_csv
+    from feature_store import materialize_region_matrices, load_region_matrix, save_region_params
+    from config_models import (run_lof, run_dbscan, run_isolation_forest, tune_dbscan_hyperparameters,
+                               add_ensemble_columns, model_cols)
+    from anomaly_store import append_scores
+
+    start = time.perf_counter()
+    summary = {"region": region_name, "status": "ok", "rows": 0}
+
+    # 1. Ingest
+    demand_df = fetch_eia_data(CONFIG["api_key"], region_info["code"], CONFIG["start_date"], CONFIG["end_date"], 'demand')
+    weather_df = fetch_weather(region_info["lat"], region_info["lon"], CONFIG["start_date"], CONFIG["end_date"])
+    if demand_df.empty or weather_df.empty:
+        summary["status"] = "no data"
+        return summary
+    merged_df = pd.merge(demand_df, weather_df, on="datetime", how="left").sort_values("datetime", kind="stable")
+    del demand_df, weather_df
+
+    # 2. Features
+    if feature_memory_mb:
+        raw_path = os.path.join(output_dir, f"{region_file_name(region_name)}_raw.csv")
+        features_path = os.path.join(output_dir, f"{region_file_name(region_name)}_features.csv")
+        merged_df.to_csv(raw_path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+        del merged_df
+        create_features_from_csv(raw_path, features_path, CONFIG["features_for_model"], feature_memory_mb,
+                                 extra_columns={'region': region_name})
+        df = read_compact_csv(features_path)
+        os.remove(raw_path)
+        os.remove(features_path)
+    else:
+        df = create_features(merged_df, CONFIG["features_for_model"])
+        del merged_df
+        df['region'] = region_name
+        df = compact_frame(df)
+    features = anomaly_features(df.columns)
+
+    # 3. Detect (on the memory-mapped scaled matrix of this region)
+    store_dir = os.path.join(output_dir, "feature_store")
+    materialize_region_matrices(df, features, store_dir=store_dir)
+    X, _ = load_region_matrix(region_name, store_dir=store_dir)
+    # Regions already run in parallel processes, so DBSCAN stays single-process here
+    params = tune_dbscan_hyperparameters(X, region_name, features, n_trials=n_trials, scaled=True, n_jobs=1)
+    save_region_params(region_name, params, store_dir=store_dir)
+    df['lof_anomaly'] = run_lof(X, features, contamination=contamination, scaled=True).to_numpy()
+    df['dbscan_anomaly'] = run_dbscan(X, features, eps=params['eps'], min_samples=params['min_samples'], scaled=True, n_jobs=1).to_numpy()
+    df['isolation_forest_anomaly'] = run_isolation_forest(X, features, contamination=contamination).to_numpy()
+    del X
+
+    # 4. Ensemble, persist, release
+    add_ensemble_columns(df)
+    df.to_csv(os.path.join(output_dir, f"{region_file_name(region_name)}.csv"), index=False)
+    append_scores(df, db_path=os.path.join(output_dir, "anomalies.sqlite"))
+
+    summary.update({
+        "rows": len(df),
+        **{col: int(df[col].sum()) for col in model_cols},
+        "ensemble_final_anomaly": int(df['ensemble_final_anomaly'].sum()),
+        "runtime_s": time.perf_counter() - start,
+    })
+    del df
+    return summary
+
+
+def _combine_csv(paths: list, output_path: str):
+    """Concatenate per-region CSV files on disk (one header), without loading them into memory."""
+    header = None
+    with open(output_path, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                first_line = f.readline()
+                if header is None:
+                    header = first_line
+                    out.write(header)
+                elif first_line != header:
+                    print(f"[Scheduler] Skipping {path} in the combined file: its columns differ.")
+                    continue
+                shutil.copyfileobj(f, out)
+
+
+def run_scheduler(regions: dict = None, max_workers: int = 2, memory_budget_mb: float = 4096,
+                  output_dir: str = SCHEDULER_DIR, n_trials: int = 50,
+                  combined_path: str = "final_with_anomalies.csv") -> pd.DataFrame:
+    """
+    Run every region through the pipeline with at most `max_workers` regions in flight and the
+    estimated memory of the regions in flight kept within `memory_budget_mb`.
+    Each worker process handles one region and exits, so its memory is returned as soon as the
+    region's results are on disk. Returns one summary row per region.
+    """
+    regions = regions if regions is not None else load_region_catalog()
+    os.makedirs(output_dir, exist_ok=True)
+
+    per_region_mb = estimate_region_mb()
+    feature_memory_mb = None
+    if per_region_mb > memory_budget_mb:
+        # Out-of-core features within half the budget; the rest is left for the detectors
+        feature_memory_mb = memory_budget_mb / 2
+        print(f"[Scheduler] One region needs about {per_region_mb:.0f} MB, above the {memory_budget_mb:.0f} MB budget; "
+              f"regions will run one at a time, with features built in chunks within {feature_memory_mb:.0f} MB.")
+    print(f"[Scheduler] {len(regions)} regions, up to {max_workers} at a time, "
+          f"~{per_region_mb:.0f} MB each within a {memory_budget_mb:.0f} MB budget.")
+
+    pending = list(regions.items())
+    running = {}
+    summaries = []
+    reserved_mb = 0.0
+    with ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1) as pool:
+        while pending or running:
+            # Start regions while both the concurrency limit and the memory budget allow it
+            while pending and len(running) < max_workers and (
+                    not running or reserved_mb + per_region_mb <= memory_budget_mb):
+                region_name, region_info = pending.pop(0)
+                future = pool.submit(process_region, region_name, region_info, output_dir, n_trials,
+                                     feature_memory_mb=feature_memory_mb)
+                running[future] = region_name
+                reserved_mb += per_region_mb
+                print(f"[Scheduler] Started {region_name} ({len(running)} running, {len(pending)} pending)")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                region_name = running.pop(future)
+                reserved_mb -= per_region_mb
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    summary = {"region": region_name, "status": f"failed: {e}", "rows": 0}
+                summaries.append(summary)
+                print(f"[Scheduler] Finished {region_name}: {summary['status']}, {summary['rows']} rows")
+
+    summaries = pd.DataFrame(summaries)
+    summaries.to_csv(os.path.join(output_dir, "summary.csv"), index=False)
+
+    finished = [os.path.join(output_dir, f"{region_file_name(s['region'])}.csv") for s in summaries.to_dict('records') if s["status"] == "ok"]
+    if combined_path and finished:
+        _combine_csv(finished, combined_path)
+        print(f"[Scheduler] Combined {len(finished)} regions into {combined_path}")
+    return summaries
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the pipeline for every region in the catalog.")
+    parser.add_argument("--catalog", default=None, help="Region catalog file (CSV or JSON). Default: CONFIG['region_catalog'].")
+    parser.add_argument("--workers", type=int, default=2, help="Maximum number of regions processed at once.")
+    parser.add_argument("--memory-mb", type=float, default=4096, help="Global memory budget in MB.")
+    parser.add_argument("--trials", type=int, default=50, help="DBSCAN tuning trials per region.")
+    args = parser.parse_args()
+
+    run_scheduler(load_region_catalog(args.catalog), max_workers=args.workers,
+                  memory_budget_mb=args.memory_mb, n_trials=args.trials)
@@ -1,4 +1,6 @@
 import os
+import json
+import csv
 from dotenv import load_dotenv
 
 def load_api_key():
@@ -31,6 +33,13 @@ CONFIG = {
         "ERCOT": {"code": "ERCO", "lat": 29.76, "lon": -95.36},
         "CAISO": {"code": "CISO", "lat": 34.05, "lon": -118.25},
     },
+    # Optional local catalog of regions (CSV or JSON with name, code, lat, lon) used instead of "regions"
+    "region_catalog": "regions.csv",
+    # Rolling (stat, window hours) columns built for every target; stat is mean, std, min or max.
+    # Rolling columns named in "features_for_model" (e.g. 'demand_MW_rolling_max_168h') are added on top.
+    "rolling_stats": [("mean", 6), ("std", 6), ("mean", 24), ("std", 24), ("mean", 168), ("std", 168)],
+    # DBSCAN implementation: "sklearn", "grid" (partitioned, parallel, bounded memory) or "auto" (grid for large regions)
+    "dbscan_mode": "auto",
     "features_for_model": [
         # Cyclical & Time Features
         'hour_sin', 'hour_cos', 'day_of_year_sin', 'day_of_year_cos',
@@ -44,22 +53,58 @@ CONFIG = {
         'demand_MW_lag_168h',
         'demand_MW_rolling_mean_24h',
         'demand_MW_rolling_std_24h',
+        'demand_MW_rolling_mean_6h',
+        'demand_MW_rolling_std_6h',
+        'demand_MW_rolling_mean_168h',
+        'demand_MW_rolling_std_168h',
         'demand_ewma_24h',
 
         # Temperature Features
         'temp_celsius_lag_24h',
         'temp_celsius_rolling_mean_24h',
         'temp_celsius_rolling_std_24h',
+        'temp_celsius_rolling_mean_6h',
+        'temp_celsius_rolling_std_6h',
+        'temp_celsius_rolling_mean_168h',
+        'temp_celsius_rolling_std_168h',
 
         # Net Demand Features
         'net_demand_MW',
         'net_demand_MW_lag_24h',
         'net_demand_MW_rolling_mean_24h',
         'net_demand_MW_rolling_std_24h',
+        'net_demand_MW_rolling_mean_6h',
+        'net_demand_MW_rolling_std_6h',
+        'net_demand_MW_rolling_mean_168h',
+        'net_demand_MW_rolling_std_168h',
 
         # Price Features
         'price_USD_per_MWh',
         'price_USD_per_MWh_lag_24h',
         'price_USD_per_MWh_rolling_mean_24h',
     ]
-}
\ No newline at end of file
+}
+
+
+def load_region_catalog(path: str = None) -> dict:
+    """
+    Load the regions to monitor from a local file, in the same shape as CONFIG["regions"].
+    CSV files need the columns name, code, lat, lon; JSON files hold either that dict or a list of such records.
+    Falls back to CONFIG["regions"] when the file does not exist.
+    """
+    path = path or CONFIG["region_catalog"]
+    if not path or not os.path.exists(path):
+        return CONFIG["regions"]
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            records = json.load(f)
+            if isinstance(records, dict):
+                records = [{"name": name, **info} for name, info in records.items()]
+        else:
+            records = list(csv.DictReader(f))
+
+    return {
+        record["name"]: {"code": record["code"], "lat": float(record["lat"]), "lon": float(record["lon"])}
+        for record in records
+    }
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def stationary_merged(hours: int, seed: int = 0, start: str = "2021-01-01") -> pd.DataFrame:
+    """
+    Synthetic merged demand + weather rows (the output of the ingest stage) with daily and weekly
+    cycles and independent noise, but no trend or season: every month has the same distribution.
+    """
+    rng = np.random.default_rng(seed)
+    datetimes = pd.date_range(start, periods=hours, freq="h")
+    hour = datetimes.hour.to_numpy()
+    weekday = datetimes.dayofweek.to_numpy()
+    temp = 20 + 6 * np.sin(2 * np.pi * (hour - 9) / 24) + rng.normal(0, 2, hours)
+    demand = (40000 + 4000 * np.sin(2 * np.pi * (hour - 6) / 24) - 2500 * (weekday >= 5)
+              + 150 * temp + rng.normal(0, 800, hours))
+    return pd.DataFrame({"datetime": datetimes, "demand_MW": demand, "temp_celsius": temp,
+                         "humidity_percent": rng.uniform(30, 80, hours)})
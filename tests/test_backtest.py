@@ -0,0 +1,26 @@
+from conftest import stationary_merged
+from backtest import run_backtest
+from model_frame import compact_frame
+from s2_fe import create_features
+from settings import CONFIG
+
+
+def _features(hours: int):
+    df = create_features(stationary_merged(hours), CONFIG["features_for_model"])
+    df['region'] = 'TEST'
+    return compact_frame(df)
+
+
+def test_backtest_without_drift_scores(tmp_path):
+    # Calendar features only: nothing is monitored for drift, so no window gets drift columns
+    df = _features(24 * 75)
+    results = run_backtest(df, features=['hour_sin', 'hour_cos', 'is_weekend'], train_months=1, n_trials=0,
+                           n_jobs=1, output_path=str(tmp_path / "backtest.csv"))
+    assert len(results) == 2
+    assert 'max_psi' not in results.columns
+
+
+def test_backtest_without_windows(tmp_path):
+    results = run_backtest(_features(24 * 20), train_months=1, n_trials=0, n_jobs=1,
+                           output_path=str(tmp_path / "backtest.csv"))
+    assert results.empty
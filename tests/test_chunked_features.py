@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import stationary_merged
+from s2_fe import create_features, create_features_chunked, create_features_from_csv
+from settings import CONFIG
+
+
+def _with_gaps(hours: int, seed: int) -> pd.DataFrame:
+    merged = stationary_merged(hours, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    missing = np.r_[rng.choice(np.arange(200, hours - 200), 60, replace=False), hours // 2:hours // 2 + 30]
+    return merged.drop(index=missing).reset_index(drop=True)
+
+
+def _assert_same_features(actual: pd.DataFrame, expected: pd.DataFrame):
+    assert list(actual.columns) == list(expected.columns)
+    assert (actual['datetime'].to_numpy() == expected['datetime'].to_numpy()).all()
+    numeric = expected.select_dtypes('number').columns
+    np.testing.assert_allclose(actual[numeric].to_numpy(float), expected[numeric].to_numpy(float),
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_chunked_matches_in_memory_with_gaps(tmp_path):
+    merged = _with_gaps(3000, seed=4)
+    expected = create_features(merged, CONFIG["features_for_model"])
+
+    # Chunks shorter than the 168h lookback, so history is carried over several chunks
+    output_path = tmp_path / "features.csv"
+    chunks = (merged.iloc[start:start + 100] for start in range(0, len(merged), 100))
+    rows = create_features_chunked(chunks, CONFIG["features_for_model"], str(output_path))
+    assert rows == len(expected)
+    _assert_same_features(pd.read_csv(output_path, parse_dates=['datetime']), expected)
+
+
+def test_from_csv_appends_regions(tmp_path):
+    output_path = tmp_path / "features.csv"
+    expected = []
+    for i, region in enumerate(['ERCOT', 'CAISO']):
+        merged = _with_gaps(2000, seed=10 + i)
+        input_path = tmp_path / f"{region}.csv"
+        merged.to_csv(input_path, index=False)
+        create_features_from_csv(str(input_path), str(output_path), CONFIG["features_for_model"],
+                                 memory_limit_mb=1, extra_columns={'region': region}, append=True)
+        expected.append(create_features(merged, CONFIG["features_for_model"]).assign(region=region))
+
+    chunked = pd.read_csv(output_path, parse_dates=['datetime'])
+    _assert_same_features(chunked, pd.concat(expected, ignore_index=True))
+    assert chunked['region'].tolist() == pd.concat(expected)['region'].tolist()
+
+
+def test_chunked_rejects_unsorted_input(tmp_path):
+    merged = stationary_merged(600)
+    chunks = [merged.iloc[300:], merged.iloc[:300]]
+    with pytest.raises(ValueError, match='sorted'):
+        create_features_chunked(chunks, CONFIG["features_for_model"], str(tmp_path / "features.csv"))
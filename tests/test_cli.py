@@ -0,0 +1,45 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+
+# Libraries that only the subcommands may import
+HEAVY_MODULES = ['pandas', 'sklearn', 'optuna', 'shap', 'seaborn']
+
+# Extra start-up time allowed over a bare interpreter (importing pandas alone takes about 0.3s)
+STARTUP_MARGIN_S = 0.25
+
+
+def _run(*args):
+    """Run the interpreter in the repository folder; returns (completed process, wall time in seconds)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=REPO, capture_output=True, text=True)
+    return result, time.perf_counter() - start
+
+
+def _imported_modules(importtime_log: str) -> set:
+    """Top-level package of every module listed by -X importtime."""
+    modules = set()
+    for line in importtime_log.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            name = line.rsplit('|', 1)[1].strip()
+            modules.add(name.split('.')[0])
+    return modules
+
+
+def test_help_imports_no_heavy_modules():
+    result, _ = _run('-X', 'importtime', 'cli.py', '--help')
+    assert result.returncode == 0, result.stderr
+    assert 'usage:' in result.stdout
+    imported = _imported_modules(result.stderr)
+    assert imported, "no -X importtime output"
+    assert not imported & set(HEAVY_MODULES)
+
+
+def test_help_starts_about_as_fast_as_a_bare_interpreter():
+    # Best of a few runs, so a busy machine does not fail the test
+    bare = min(_run('-c', 'pass')[1] for _ in range(3))
+    cli = min(_run('cli.py', '--help')[1] for _ in range(3))
+    assert cli < bare + STARTUP_MARGIN_S, f"cli.py --help took {cli:.2f}s, a bare interpreter {bare:.2f}s"
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from conftest import stationary_merged
+from drift import FeatureSketch, drift_scores, run_drift_monitor, drift_features
+from model_frame import compact_frame
+from s2_fe import create_features
+from settings import CONFIG
+
+
+def test_identical_distributions_have_no_drift():
+    X = np.random.default_rng(1).normal(size=(5000, 3)) * [1, 100, 1e-2]
+    baseline = FeatureSketch(3).update(X)
+    current = FeatureSketch(3).update(X)
+    scores = drift_scores(baseline, current, ['a', 'b', 'c'])
+    assert np.allclose(scores['psi'], 0) and np.allclose(scores['ks'], 0)
+    assert not scores['drifted'].any()
+
+
+def test_shifted_distribution_drifts():
+    rng = np.random.default_rng(2)
+    baseline = FeatureSketch(1).update(rng.normal(size=(5000, 1)))
+    current = FeatureSketch(1).update(rng.normal(1.0, 1.0, size=(2000, 1)))
+    assert drift_scores(baseline, current, ['a'])['drifted'].all()
+
+
+def test_sketches_merge_like_one_pass():
+    X = np.random.default_rng(3).lognormal(size=(3000, 2))
+    merged = FeatureSketch(2).update(X[:1000]).merge(FeatureSketch(2).update(X[1000:]))
+    whole = FeatureSketch(2).update(X)
+    assert (merged.counts == whole.counts).all()
+    assert np.allclose(merged.mean, X.mean(axis=0)) and np.allclose(merged.std, X.std(axis=0, ddof=1))
+
+
+def test_stationary_history_raises_no_alerts():
+    df = create_features(stationary_merged(2 * 8760), CONFIG["features_for_model"])
+    df['region'] = 'TEST'
+    results = run_drift_monitor(compact_frame(df), output_path=None)
+    assert set(results['feature']) == set(drift_features(df.columns))
+    assert results['month'].nunique() == 24
+    assert not results['drifted'].any(), results.loc[results['drifted'], ['month', 'feature', 'psi', 'ks']]
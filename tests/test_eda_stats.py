@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from scipy import stats as sps
+
+from conftest import stationary_merged
+from eda_stats import compute_eda_stats, region_table, hour_table, top_changes
+from s2_fe import create_features
+from settings import CONFIG
+
+
+def _dataset() -> pd.DataFrame:
+    frames = []
+    for i, region in enumerate(['ERCOT', 'CAISO']):
+        df = create_features(stationary_merged(1500, seed=20 + i), CONFIG["features_for_model"])
+        frames.append(df.assign(region=region))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_eda_stats_match_per_region_loops():
+    df = _dataset()
+    stats = compute_eda_stats(df, top_k=3)
+    regions, hours = region_table(stats), hour_table(stats)
+
+    for region, group in df.groupby('region'):
+        x = group['demand_MW']
+        row = regions.loc[region]
+        assert np.isclose(row['mean'], x.mean())
+        assert np.isclose(row['skewness'], sps.skew(x))
+        assert np.isclose(row['kurtosis'], sps.kurtosis(x))
+
+        q1, q3 = x.quantile([0.25, 0.75])
+        outliers = ((x < q1 - 1.5 * (q3 - q1)) | (x > q3 + 1.5 * (q3 - q1))).sum()
+        assert row['outliers'] == outliers
+
+        t_stat, p_value = sps.ttest_ind(x[group['is_weekend'] == 0], x[group['is_weekend'] == 1], equal_var=False)
+        assert np.isclose(row['t_statistic'], t_stat) and np.isclose(row['p_value'], p_value)
+
+        for hour, hour_group in group.groupby('hour'):
+            hx = hour_group['demand_MW']
+            q1, q3 = hx.quantile([0.25, 0.75])
+            outliers = ((hx < q1 - 1.5 * (q3 - q1)) | (hx > q3 + 1.5 * (q3 - q1))).sum()
+            assert hours.loc[(region, hour), 'outliers'] == outliers
+            assert np.isclose(hours.loc[(region, hour), 'mean'], hx.mean())
+
+        change = (x - group['demand_MW_lag_24h']).dropna()
+        top = top_changes(stats, region, 'increase')
+        assert np.allclose(top['demand_change_24h'].to_numpy(), change.nlargest(3).to_numpy())
+        bottom = top_changes(stats, region, 'decrease')
+        assert np.allclose(bottom['demand_change_24h'].to_numpy(), change.nsmallest(3).to_numpy())
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import stationary_merged
+from s2_fe import create_features, hourly_grid, gap_stats
+from settings import CONFIG
+
+
+def test_hourly_grid_slots_and_gaps():
+    datetimes = pd.Series(pd.to_datetime(['2024-01-01 00:00', '2024-01-01 01:00', '2024-01-01 04:00']))
+    slots, valid = hourly_grid(datetimes)
+    assert slots.tolist() == [0, 1, 4]
+    assert valid.tolist() == [True, True, False, False, True]
+    assert gap_stats(datetimes)['missing_hours'] == 2
+
+
+def test_hourly_grid_rejects_sub_hourly_timestamps():
+    datetimes = pd.Series(pd.date_range('2024-01-01', periods=36, freq='5min'))
+    with pytest.raises(ValueError, match='sub-hourly'):
+        hourly_grid(datetimes)
+
+
+def test_hourly_grid_rejects_repeated_hours():
+    datetimes = pd.Series(pd.to_datetime(['2024-01-01 00:00', '2024-01-01 01:00', '2024-01-01 01:00']))
+    with pytest.raises(ValueError, match='repeat'):
+        hourly_grid(datetimes)
+
+
+def test_create_features_drops_duplicates_and_rejects_sub_hourly():
+    merged = stationary_merged(400)
+    duplicated = pd.concat([merged, merged.iloc[[200]]]).sort_values('datetime', kind='stable')
+    features = create_features(duplicated, CONFIG["features_for_model"])
+    assert features['datetime'].is_unique
+    assert len(features) == len(create_features(merged, CONFIG["features_for_model"]))
+
+    sub_hourly = merged.assign(datetime=pd.date_range('2024-01-01', periods=len(merged), freq='5min'))
+    with pytest.raises(ValueError, match='sub-hourly'):
+        create_features(sub_hourly, CONFIG["features_for_model"])
+
+
+def test_lags_follow_hours_across_gaps():
+    merged = stationary_merged(600)
+    merged = merged.drop(index=range(300, 310)).reset_index(drop=True)
+    features = create_features(merged, CONFIG["features_for_model"]).set_index('datetime')
+    by_hour = merged.set_index('datetime')['demand_MW']
+    expected = by_hour.reindex(features.index - pd.Timedelta(hours=24)).to_numpy()
+    assert np.allclose(features['demand_MW_lag_24h'].to_numpy(), expected, equal_nan=True)
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import materialize_region_matrices, load_region_matrix, stored_region_matrix, unscale
+from model_frame import compact_frame, region_file_name
+
+REGIONS = ['ERCOT', 'PJM/East', 'New York', '../outside']
+
+
+def _frame() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    frames = [pd.DataFrame({'datetime': pd.date_range('2024-01-01', periods=50, freq='h'), 'region': region,
+                            'a': rng.normal(i, 1, 50), 'b': rng.normal(0, i + 1, 50)})
+              for i, region in enumerate(REGIONS)]
+    return compact_frame(pd.concat(frames, ignore_index=True))
+
+
+def test_region_file_names_are_safe_and_distinct():
+    names = [region_file_name(region) for region in REGIONS + ['PJM East', 'PJM_East']]
+    assert names[0] == 'ERCOT' and names[-1] == 'PJM_East'
+    assert len(set(names)) == len(names)
+    assert all('/' not in name and ' ' not in name and not name.startswith('.') for name in names)
+
+
+def test_store_stays_inside_its_folder(tmp_path):
+    store_dir = tmp_path / "store"
+    df = _frame()
+    materialize_region_matrices(df, ['a', 'b'], store_dir=str(store_dir))
+    assert sorted(os.listdir(tmp_path)) == ['store']
+    assert len(os.listdir(store_dir)) == 2 * len(REGIONS)
+
+    for region in REGIONS:
+        rows = df['region'] == region
+        matrix, meta = load_region_matrix(region, store_dir=str(store_dir))
+        assert meta['region'] == region
+        np.testing.assert_allclose(unscale(matrix, meta).to_numpy(), df.loc[rows, ['a', 'b']].to_numpy(), rtol=1e-5)
+        assert stored_region_matrix(df[rows], region, ['a', 'b'], store_dir=str(store_dir)) is not None
+        # Other rows or features than the ones materialized are not served from the store
+        assert stored_region_matrix(df[rows].iloc[:10], region, ['a', 'b'], store_dir=str(store_dir)) is None
+        assert stored_region_matrix(df[rows], region, ['a'], store_dir=str(store_dir)) is None
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from sklearn.cluster import DBSCAN
+
+import grid_dbscan
+from grid_dbscan import grid_dbscan as run_grid_dbscan
+
+
+def _blobs(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = np.array([[0, 0, 0], [4, 0, 1], [0, 5, -2], [8, 8, 8]])
+    points = np.concatenate([center + rng.normal(0, 0.6, size=(150, 3)) for center in centers])
+    return np.concatenate([points, rng.uniform(-4, 12, size=(60, 3))])
+
+
+def _same_partition(a: np.ndarray, b: np.ndarray) -> bool:
+    """Both labelings group the points identically (cluster ids may differ)."""
+    pairs = np.unique(np.column_stack([a, b]), axis=0)
+    return len(pairs) == len(np.unique(a)) == len(np.unique(b))
+
+
+@pytest.mark.parametrize("eps, min_samples", [(0.5, 5), (0.8, 10), (1.5, 4)])
+def test_grid_dbscan_matches_sklearn(monkeypatch, eps, min_samples):
+    # A tiny edge budget forces many neighbor chunks per slab
+    monkeypatch.setattr(grid_dbscan, "EDGE_BUDGET", 50)
+    X = _blobs()
+    expected = DBSCAN(eps=eps, min_samples=min_samples).fit(X)
+    expected_core = np.zeros(len(X), dtype=bool)
+    expected_core[expected.core_sample_indices_] = True
+
+    labels, core = run_grid_dbscan(X, eps, min_samples, n_jobs=1, n_parts=6)
+    assert (core == expected_core).all()
+    assert ((labels == -1) == (expected.labels_ == -1)).all()
+    # Core points form the same clusters; border points may join either neighboring cluster
+    assert _same_partition(labels[core], expected.labels_[core])
+
+
+def test_grid_dbscan_empty_and_all_noise():
+    labels, core = run_grid_dbscan(np.empty((0, 2)), 0.5, 5, n_jobs=1)
+    assert len(labels) == 0 and len(core) == 0
+    X = np.arange(20, dtype=float).reshape(10, 2) * 10
+    labels, core = run_grid_dbscan(X, 0.5, 2, n_jobs=1)
+    assert (labels == -1).all() and not core.any()
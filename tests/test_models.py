@@ -0,0 +1,18 @@
+import numpy as np
+
+import config_models
+from config_models import tune_dbscan_hyperparameters
+
+
+def test_tuning_passes_n_jobs_to_every_trial(monkeypatch):
+    seen = []
+    original = config_models.dbscan_labels
+
+    def recording_labels(data, eps, min_samples, algorithm=None, n_jobs=None):
+        seen.append(n_jobs)
+        return original(data, eps, min_samples, algorithm=algorithm, n_jobs=n_jobs)
+
+    monkeypatch.setattr(config_models, "dbscan_labels", recording_labels)
+    X = np.random.default_rng(0).normal(size=(300, 3))
+    tune_dbscan_hyperparameters(X, "TEST", ['a', 'b', 'c'], n_trials=3, scaled=True, n_jobs=1)
+    assert seen == [1, 1, 1]
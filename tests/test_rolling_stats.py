@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling_stats import rolling_stats, ewma, ROLLING_STATS
+
+REQUESTS = [(stat, window) for stat in ROLLING_STATS for window in (1, 6, 24, 168)]
+
+
+def _series(n: int = 600, gaps: bool = True, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Large offset and small spread: the case where a naive sum-of-squares variance cancels
+    values = np.column_stack([40000 + rng.normal(0, 5, n), rng.normal(0, 1, n), rng.lognormal(size=n)])
+    if gaps:
+        values[rng.choice(n, 60, replace=False), 0] = np.nan
+        values[200:230, 1] = np.nan
+        values[:, 2][rng.random(n) < 0.3] = np.nan
+    return values
+
+
+@pytest.mark.parametrize("gaps", [False, True])
+def test_rolling_stats_match_pandas(gaps):
+    values = _series(gaps=gaps)
+    results = rolling_stats(values, REQUESTS)
+    frame = pd.DataFrame(values)
+    for stat, window in REQUESTS:
+        expected = getattr(frame.rolling(window, min_periods=1), stat)().to_numpy()
+        np.testing.assert_allclose(results[(stat, window)], expected, rtol=1e-9, atol=1e-9,
+                                   err_msg=f"{stat} {window}h")
+
+
+def test_rolling_stats_only_returns_requested_pairs():
+    results = rolling_stats(_series(100), [('mean', 24), ('max', 6)])
+    assert set(results) == {('mean', 24), ('max', 6)}
+    with pytest.raises(ValueError, match='median'):
+        rolling_stats(_series(100), [('median', 24)])
+
+
+def test_ewma_matches_pandas_across_gaps():
+    values = _series()[:, 0]
+    expected = pd.Series(values).ewm(span=24, adjust=False, ignore_na=False).mean().to_numpy()
+    np.testing.assert_allclose(ewma(values, span=24), expected, rtol=1e-10)
+
+
+def test_ewma_seed_continues_an_earlier_run():
+    values = _series(gaps=False)[:, 1]
+    whole = ewma(values, span=24)
+    np.testing.assert_allclose(ewma(values[300:], span=24, seed=(whole[299], 1)), whole[300:], rtol=1e-10)